@@ -36,6 +36,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  
     'django.middleware.security.SecurityMiddleware',
+    'Xpensure.middleware.CompressionMiddleware',  # ✅ gzip / brotli for large responses
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -108,13 +109,32 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.TokenAuthentication',
     ),
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'Xpensure.renderers.FastJSONRenderer',  # ✅ orjson; same output as JSONRenderer
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
 }
 
+# ✅ CACHE (dashboard responses)
+# Per-process is fine: cache keys embed the data version, which lives in the database (DataVersion)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'xpensure-default',
+    }
+}
+DASHBOARD_CACHE_TIMEOUT = 300  # seconds; entries are also invalidated on every data change
+
+# ✅ Responses smaller than this (bytes) are not compressed
+API_COMPRESSION_MIN_SIZE = 1024
+
+# ✅ Seconds employee lookups (names, roles, avatars) are shared between requests; 0 = per request only
+EMPLOYEE_DIRECTORY_TTL = 0
+
+# ✅ Max age (seconds) of each process's org-chart routing index; edits made through another worker show up within this
+ORG_CHART_TTL = 30
+
 # ✅ MEDIA SETTINGS
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
@@ -0,0 +1,496 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import (
+    Aggregate, Avg, Case, Count, DateTimeField, DecimalField, DurationField, ExpressionWrapper, F, Max, OuterRef, Q,
+    Subquery, Sum, When,
+)
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from .models import Employee, Reimbursement, AdvanceRequest, ApprovalHistory, DailySpendRollup
+
+# -----------------------------
+# Shared aggregation layer for dashboard / analytics endpoints
+# -----------------------------
+# The "business" date of each request type (what the dashboards bucket by)
+DATE_FIELDS = {
+    Reimbursement: 'date',
+    AdvanceRequest: 'request_date',
+}
+
+REQUEST_MODELS = {
+    'reimbursement': Reimbursement,
+    'advance': AdvanceRequest,
+}
+
+
+def conditional_totals(queryset, buckets, count_field=None):
+    """
+    Count and sum `amount` for every named bucket in ONE query.
+
+    `buckets` maps a name to a Q filter. The result has '<name>_count' and
+    '<name>_amount' keys; amounts are Decimals and never None. Pass
+    `count_field` when the rows are already pre-counted (e.g. rollup rows).
+    """
+    aggregates = {}
+    for name, condition in buckets.items():
+        if count_field:
+            aggregates[f'{name}_count'] = Sum(count_field, filter=condition)
+        else:
+            aggregates[f'{name}_count'] = Count('id', filter=condition)
+        aggregates[f'{name}_amount'] = Sum('amount', filter=condition)
+
+    totals = queryset.aggregate(**aggregates)
+    for name in buckets:
+        if totals[f'{name}_count'] is None:
+            totals[f'{name}_count'] = 0
+        if totals[f'{name}_amount'] is None:
+            totals[f'{name}_amount'] = Decimal('0')
+    return totals
+
+
+def totals_by_type(buckets_for, queryset_for=None):
+    """
+    Run `conditional_totals` once per request table.
+
+    `buckets_for(model)` returns the bucket dict for that model (so callers can
+    use the right date field); `queryset_for(model)` optionally narrows the
+    base queryset. Returns {'reimbursement': {...}, 'advance': {...}}.
+    """
+    results = {}
+    for request_type, model in REQUEST_MODELS.items():
+        queryset = queryset_for(model) if queryset_for else model.objects.all()
+        results[request_type] = conditional_totals(queryset, buckets_for(model))
+    return results
+
+
+def rollup_totals_by_type(buckets, **filters):
+    """
+    Same shape as `totals_by_type`, read from DailySpendRollup in ONE query
+    instead of scanning the request tables. Buckets (and `filters`) use the
+    rollup's own fields: day, status, department, project_id.
+    """
+    per_type_buckets = {
+        f'{request_type}__{name}': Q(request_type=request_type) & condition
+        for request_type in REQUEST_MODELS
+        for name, condition in buckets.items()
+    }
+    flat = conditional_totals(DailySpendRollup.objects.filter(**filters), per_type_buckets, count_field='count')
+
+    results = {request_type: {} for request_type in REQUEST_MODELS}
+    for key, value in flat.items():
+        request_type, metric = key.split('__', 1)
+        results[request_type][metric] = value
+    return results
+
+
+def merge_totals(*parts):
+    """Merge several {'reimbursement': {...}, 'advance': {...}} results"""
+    merged = {request_type: {} for request_type in REQUEST_MODELS}
+    for part in parts:
+        for request_type, values in part.items():
+            merged[request_type].update(values)
+    return merged
+
+
+def combined(totals, key):
+    """Sum one metric across both request types"""
+    return sum(per_type[key] for per_type in totals.values())
+
+
+def ceo_period_buckets(date_field, today):
+    """Date/status buckets behind the CEO analytics cards"""
+    month_start = today.replace(day=1)
+    last_month_start = (month_start - timedelta(days=1)).replace(day=1)
+    week_start = today - timedelta(days=today.weekday())
+
+    this_month = Q(**{f'{date_field}__gte': month_start})
+    return {
+        'month': this_month,
+        'month_approved': this_month & Q(status='Approved'),
+        'month_rejected': this_month & Q(status='Rejected'),
+        'month_pending': this_month & Q(status='Pending'),
+        'last_month_approved': Q(**{
+            f'{date_field}__gte': last_month_start,
+            f'{date_field}__lt': month_start,
+        }) & Q(status='Approved'),
+        'week_approved': Q(**{f'{date_field}__gte': week_start}) & Q(status='Approved'),
+    }
+
+
+def ceo_queue_buckets(ceo_employee_id, today):
+    """Buckets that depend on submission time / current approver (not in the rollup)"""
+    return {
+        'today': Q(created_at__date=today),
+        'pending_ceo': Q(current_approver_id=ceo_employee_id, status='Pending'),
+    }
+
+
+def ceo_period_totals(ceo_employee_id, today):
+    """
+    All CEO analytics counters/sums. Period cards come from the daily rollup
+    (cost independent of history size); today's submissions and the CEO's own
+    queue come from one narrow conditional aggregate per request table.
+    """
+    last_month_start = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+    period = rollup_totals_by_type(ceo_period_buckets('day', today), day__gte=last_month_start)
+    queue_buckets = ceo_queue_buckets(ceo_employee_id, today)
+    queue = totals_by_type(
+        lambda model: queue_buckets,
+        lambda model: model.objects.filter(
+            Q(created_at__date=today) | Q(current_approver_id=ceo_employee_id, status='Pending')
+        ),
+    )
+    return merge_totals(period, queue)
+
+
+def department_totals(since, **filters):
+    """
+    Count and amount per department for requests dated on/after `since`, in
+    ONE GROUP BY over DailySpendRollup - the department recorded at
+    submission, as in every other rollup-backed figure. `filters` use the
+    rollup's fields (status, request_type, ...). Returns [{'department',
+    'amount', 'count'}] sorted by department; requests without a department
+    are skipped.
+    """
+    grouped = (
+        DailySpendRollup.objects
+        .filter(day__gte=since, **filters)
+        .exclude(department='')
+        .values('department')
+        .annotate(request_count=Sum('count'), request_amount=Sum('amount'))
+        .order_by('department')
+    )
+    return [
+        {'department': row['department'], 'amount': float(row['request_amount']), 'count': row['request_count']}
+        for row in grouped
+        if row['request_count'] > 0
+    ]
+
+
+# -----------------------------
+# Bucketed spend time-series (charts)
+# -----------------------------
+SERIES_BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,    # ISO weeks, starting Monday
+    'month': TruncMonth,
+}
+
+
+def bucket_start(day, bucket):
+    """First day of the bucket `day` falls in"""
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start, bucket):
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    if bucket == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def bucket_starts(start, end, bucket):
+    """Every bucket start between `start` and `end` (inclusive)"""
+    current = bucket_start(start, bucket)
+    while current <= end:
+        yield current
+        current = next_bucket(current, bucket)
+
+
+def spend_series(start, end, bucket, **filters):
+    """
+    Count and amount per `bucket` ('day', 'week' or 'month') for requests dated
+    between `start` and `end`, read from DailySpendRollup with ONE grouped
+    query. `filters` use the rollup's fields (status, department, project_id,
+    request_type). Buckets without requests are filled with zeros, so the
+    result always has one point per bucket in the range.
+    """
+    grouped = (
+        DailySpendRollup.objects
+        .filter(day__range=(start, end), **filters)
+        .annotate(period=SERIES_BUCKETS[bucket]('day'))
+        .values('period', 'request_type')
+        .annotate(total_count=Sum('count'), total_amount=Sum('amount'))
+        .order_by()
+    )
+
+    points = {
+        period: {
+            'period': period.isoformat(),
+            'count': 0,
+            'amount': Decimal('0'),
+            'reimbursement_count': 0,
+            'reimbursement_amount': Decimal('0'),
+            'advance_count': 0,
+            'advance_amount': Decimal('0'),
+        }
+        for period in bucket_starts(start, end, bucket)
+    }
+    for row in grouped:
+        period = row['period']
+        if hasattr(period, 'date'):
+            period = period.date()
+        point = points[period]
+        point['count'] += row['total_count'] or 0
+        point['amount'] += row['total_amount'] or 0
+        point[f"{row['request_type']}_count"] += row['total_count'] or 0
+        point[f"{row['request_type']}_amount"] += row['total_amount'] or 0
+
+    series = list(points.values())
+    for point in series:
+        for key in ('amount', 'reimbursement_amount', 'advance_amount'):
+            point[key] = float(point[key])
+    return series
+
+
+# -----------------------------
+# Processing-time metrics (ApprovalHistory -> request join)
+# -----------------------------
+def request_field(field, output_field):
+    """
+    A column of the request an ApprovalHistory row points at, resolved in SQL
+    on (request_type, request_id). NULL if the request no longer exists.
+    """
+    return Case(
+        *[
+            When(
+                request_type=request_type,
+                then=Subquery(model.objects.filter(id=OuterRef('request_id')).values(field)[:1]),
+            )
+            for request_type, model in REQUEST_MODELS.items()
+        ],
+        output_field=output_field,
+    )
+
+
+def request_created_at():
+    """Submission time of the request an ApprovalHistory row points at"""
+    return request_field('created_at', DateTimeField())
+
+
+def _time_since_submission():
+    return ExpressionWrapper(F('timestamp') - F('request_created_at'), output_field=DurationField())
+
+
+def _mean_hours(total_time, measured):
+    if not measured:
+        return None
+    return total_time.total_seconds() / 3600 / measured
+
+
+def average_processing_hours(history):
+    """
+    Mean hours from submission to each ApprovalHistory row in `history`, in ONE
+    query. Rows whose request was deleted are ignored; returns None if no rows.
+    """
+    totals = history.annotate(request_created_at=request_created_at()).aggregate(
+        total_time=Sum(_time_since_submission()),
+        measured=Count('request_created_at'),
+    )
+    return _mean_hours(totals['total_time'], totals['measured'])
+
+
+def approver_decision_totals(approver_id, month_start):
+    """
+    One approver's decisions in ONE query over ApprovalHistory: approvals per
+    request type (all time and since `month_start`), the approved requests'
+    amounts (joined from the request tables on (request_type, request_id)),
+    rejections, and mean submission -> approval hours.
+
+    Like the history it reads, a request approved twice counts twice; rows
+    whose request was deleted count as approvals but add no amount.
+    """
+    approved = Q(action='approved')
+    this_month = Q(timestamp__gte=month_start)
+
+    aggregates = {
+        'rejected_count': Count('id', filter=Q(action='rejected')),
+        'verified_amount': Sum('request_amount', filter=approved),
+        'monthly_verified_amount': Sum('request_amount', filter=approved & this_month),
+        'total_time': Sum(_time_since_submission(), filter=approved),
+        'measured': Count('request_created_at', filter=approved),
+    }
+    for request_type in REQUEST_MODELS:
+        of_type = approved & Q(request_type=request_type)
+        aggregates[f'{request_type}_verified'] = Count('id', filter=of_type)
+        aggregates[f'{request_type}_monthly_verified'] = Count('id', filter=of_type & this_month)
+
+    totals = (
+        ApprovalHistory.objects
+        .filter(approver_id=approver_id, action__in=('approved', 'rejected'))
+        .annotate(
+            request_amount=request_field('amount', DecimalField(max_digits=10, decimal_places=2)),
+            request_created_at=request_created_at(),
+        )
+        .aggregate(**aggregates)
+    )
+    totals['verified_amount'] = totals['verified_amount'] or Decimal('0')
+    totals['monthly_verified_amount'] = totals['monthly_verified_amount'] or Decimal('0')
+    totals['avg_processing_hours'] = _mean_hours(totals.pop('total_time'), totals.pop('measured'))
+    return totals
+
+
+# -----------------------------
+# Per-stage approval latency (p50/p90/p99)
+# -----------------------------
+# A decision's latency is the time since the previous event on the same
+# request (its submission or the previous stage's decision), i.e. how long
+# the request sat in that approver's inbox. The stage is the approver's role.
+STAGE_EVENTS = ('submitted', 'approved', 'rejected')
+STAGE_ORDER = ('Manager', 'Finance Verification', 'HR', 'CEO', 'Finance Payment')
+LATENCY_PERCENTILES = (50, 90, 99)
+
+
+class PercentileCont(Aggregate):
+    """PostgreSQL ordered-set aggregate: percentile_cont(fraction) WITHIN GROUP (ORDER BY expr)"""
+    function = 'PERCENTILE_CONT'
+    template = '%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+
+    def __init__(self, expression, fraction, **extra):
+        super().__init__(expression, fraction=float(fraction), **extra)
+
+
+def stage_decisions(since, **filters):
+    """
+    Approve/reject ApprovalHistory rows since `since`, annotated with
+    `stage_role` (approver's role) and `waited` (time since the previous event
+    on the same request). Computed in SQL; rows without a previous event are
+    dropped.
+    """
+    events = ApprovalHistory.objects.filter(action__in=STAGE_EVENTS).exclude(approver_id='system')
+    previous_event = (
+        events
+        .filter(
+            request_type=OuterRef('request_type'),
+            request_id=OuterRef('request_id'),
+            timestamp__lt=OuterRef('timestamp'),
+        )
+        .order_by('-timestamp')
+        .values('timestamp')[:1]
+    )
+    return (
+        events
+        .filter(action__in=('approved', 'rejected'), timestamp__gte=since, **filters)
+        .annotate(
+            stage_role=Subquery(Employee.objects.filter(employee_id=OuterRef('approver_id')).values('role')[:1]),
+            waited=ExpressionWrapper(F('timestamp') - Subquery(previous_event), output_field=DurationField()),
+        )
+        .filter(waited__isnull=False)
+    )
+
+
+def stage_name(role):
+    if role == 'Common':
+        return 'Manager'
+    return role or 'Unknown'
+
+
+def percentile(sorted_values, fraction):
+    """Linear interpolation between closest ranks - same definition as percentile_cont"""
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def _hours(value):
+    if value is None:
+        return None
+    seconds = value.total_seconds() if isinstance(value, timedelta) else value
+    return round(seconds / 3600, 2)
+
+
+def _latency_stats(count, average, percentiles):
+    stats = {'count': count, 'avg_hours': _hours(average)}
+    for p, value in zip(LATENCY_PERCENTILES, percentiles):
+        stats[f'p{p}_hours'] = _hours(value)
+    return stats
+
+
+def _latency_groups_sql(decisions, group):
+    """One GROUP BY with percentile_cont per percentile (PostgreSQL)"""
+    rows = (
+        decisions
+        .values(*group)
+        .annotate(
+            decisions=Count('id'),
+            average=Avg('waited'),
+            approver=Max('approver_name'),
+            **{f'p{p}': PercentileCont('waited', p / 100, output_field=DurationField()) for p in LATENCY_PERCENTILES},
+        )
+        .order_by()
+    )
+    return {
+        tuple(row[field] for field in group): (
+            row['approver'],
+            _latency_stats(row['decisions'], row['average'], [row[f'p{p}'] for p in LATENCY_PERCENTILES]),
+        )
+        for row in rows
+    }
+
+
+def _latency_groups_python(decisions, groups):
+    """Fallback for backends without percentile_cont: one fetch, sorted in memory"""
+    samples = {group: defaultdict(list) for group in groups}
+    names = {}
+    for row in decisions.values('stage_role', 'approver_id', 'approver_name', 'waited'):
+        seconds = row['waited'].total_seconds()
+        names[row['approver_id']] = row['approver_name']
+        for group in groups:
+            samples[group][tuple(row[field] for field in group)].append(seconds)
+
+    results = {}
+    for group, buckets in samples.items():
+        results[group] = {}
+        for key, values in buckets.items():
+            values.sort()
+            results[group][key] = (
+                names.get(key[-1]) if 'approver_id' in group else None,
+                _latency_stats(
+                    len(values),
+                    sum(values) / len(values),
+                    [percentile(values, p / 100) for p in LATENCY_PERCENTILES],
+                ),
+            )
+    return results
+
+
+def approval_latency(since, **filters):
+    """
+    Latency percentiles per approval stage and per approver since `since`.
+    Returns {'stages': [...], 'approvers': [...]}; stages follow the approval
+    chain order, approvers are sorted slowest (p90) first.
+    """
+    decisions = stage_decisions(since, **filters)
+    stage_group = ('stage_role',)
+    approver_group = ('stage_role', 'approver_id')
+
+    if connection.vendor == 'postgresql':
+        by_stage = _latency_groups_sql(decisions, stage_group)
+        by_approver = _latency_groups_sql(decisions, approver_group)
+    else:
+        grouped = _latency_groups_python(decisions, (stage_group, approver_group))
+        by_stage, by_approver = grouped[stage_group], grouped[approver_group]
+
+    stages = {}
+    for (role,), (_, stats) in by_stage.items():
+        stages[stage_name(role)] = {'stage': stage_name(role), **stats}
+    # 'Unknown' (approver since deleted) after the known stages
+    ordered = [stages.pop(stage) for stage in STAGE_ORDER if stage in stages] + list(stages.values())
+
+    approvers = [
+        {'approver_id': approver_id, 'approver_name': name, 'stage': stage_name(role), **stats}
+        for (role, approver_id), (name, stats) in by_approver.items()
+    ]
+    approvers.sort(key=lambda row: (-(row['p90_hours'] or 0), row['approver_id']))
+
+    return {'stages': ordered, 'approvers': approvers}
@@ -1,9 +1,14 @@
 from django.apps import AppConfig
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_migrate, post_save, post_delete
 
 class XpensureConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Xpensure'
 
     def ready(self):
-        pass
\ No newline at end of file
+        from . import orgchart
+        from .models import Employee
+
+        # ✅ Keep the in-memory org chart (approval routing) in step with Employee edits
+        post_save.connect(orgchart.employee_saved, sender=Employee, dispatch_uid='xpensure-org-chart-save')
+        post_delete.connect(orgchart.employee_deleted, sender=Employee, dispatch_uid='xpensure-org-chart-delete')
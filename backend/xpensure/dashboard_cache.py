@@ -0,0 +1,127 @@
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Max
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import DataVersion
+
+# -----------------------------
+# Versioned response cache for role dashboards
+# -----------------------------
+# Every cached payload is keyed by the current data version. Anything that
+# changes request data (submission, approval, rejection, payment) calls
+# bump_data_version(), which makes all older entries unreachable at once -
+# no per-key invalidation needed. Repeat polls between changes are served
+# straight from the cache.
+#
+# The version itself is a database row (DataVersion), not a cache key: the
+# default cache is per process, and a counter there would only invalidate
+# the worker that handled the write. Bumping inside the write's transaction
+# also publishes the new version together with the data it describes.
+def data_version():
+    version = DataVersion.objects.filter(pk=1).values_list('value', flat=True).first()
+    return version or 1
+
+
+def bump_data_version():
+    if not DataVersion.objects.filter(pk=1).update(value=F('value') + 1):
+        # Row missing (e.g. a flushed database) - any new value invalidates old entries
+        DataVersion.objects.get_or_create(pk=1, defaults={'value': 2})
+
+
+def _request_version(request):
+    # One read per HTTP request, shared by the cache key and the ETag
+    if not hasattr(request, '_xpensure_data_version'):
+        request._xpensure_data_version = data_version()
+    return request._xpensure_data_version
+
+
+def _origin(request):
+    # Payloads embed absolute media URLs (avatars, attachments) built from the request
+    return f'{request.scheme}://{request.get_host()}'
+
+
+def _cache_key(view_name, request):
+    # role + user + origin + period (query string) + today, so month/day boundaries roll over
+    query = request.GET.urlencode() if request.GET else ''
+    return 'xpensure:dashboard:{}:{}:{}:{}:{}:{}:{}'.format(
+        _request_version(request),
+        view_name,
+        request.user.role,
+        request.user.employee_id,
+        _origin(request),
+        timezone.now().date().isoformat(),
+        query,
+    )
+
+
+def cached_dashboard(get):
+    """Cache successful GET responses of a dashboard/insights APIView"""
+    @functools.wraps(get)
+    def wrapper(self, request, *args, **kwargs):
+        key = _cache_key(type(self).__name__, request)
+        cached = cache.get(key)
+        if cached is not None:
+            return Response(cached, status=status.HTTP_200_OK)
+
+        response = get(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300))
+        return response
+
+    return wrapper
+
+
+# -----------------------------
+# Conditional GET (ETag / If-None-Match)
+# -----------------------------
+def _etag(view_name, request, querysets):
+    parts = [
+        _request_version(request),
+        view_name,
+        request.user.role,
+        request.user.employee_id,
+        _origin(request),
+        timezone.now().date().isoformat(),
+        request.GET.urlencode() if request.GET else '',
+    ]
+    for queryset in querysets:
+        stats = queryset.aggregate(rows=Count('id'), latest=Max('updated_at'))
+        parts.append(f"{stats['rows']}:{stats['latest'].isoformat() if stats['latest'] else ''}")
+    return '"{}"'.format(hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest())
+
+
+def conditional_get(scope):
+    """
+    ETag / If-None-Match support for an APIView GET.
+
+    The validator hashes the data version, the caller, the query string and
+    (row count, latest updated_at) of every queryset `scope(request)` returns
+    - a cheap aggregate per queryset - so an unchanged poll gets a 304 before
+    the payload is built or serialized. Put it above @cached_dashboard.
+    """
+    def decorator(get):
+        @functools.wraps(get)
+        def wrapper(self, request, *args, **kwargs):
+            etag = _etag(type(self).__name__, request, scope(request))
+            client_etags = [tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))]
+            if etag in client_etags or '*' in client_etags:
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = get(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+
+        return wrapper
+
+    return decorator
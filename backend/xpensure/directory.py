@@ -0,0 +1,127 @@
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from .dashboard_cache import data_version
+from .models import Employee
+from .queries import media_urls
+
+# -----------------------------
+# Employee directory
+# -----------------------------
+# Views resolve the same people (approvers, submitters, role holders) many
+# times while building one response. An EmployeeDirectory batch-loads the
+# few columns those lookups read - one query per batch of unknown ids - and
+# remembers them for the rest of the HTTP request; directory(request)
+# returns the request's instance.
+#
+# With settings.EMPLOYEE_DIRECTORY_TTL (seconds, default 0 = off) entries
+# are also shared between requests of this process for that long. They are
+# stamped with the data version, so a profile edit (bump_data_version())
+# drops them everywhere at once.
+Person = namedtuple('Person', ['employee_id', 'fullName', 'role', 'email', 'department', 'avatar', 'report_to'])
+
+# Process-level layer: key -> (expires_at, data version, value)
+_shared = {}
+
+
+def _ttl():
+    return getattr(settings, 'EMPLOYEE_DIRECTORY_TTL', 0)
+
+
+class EmployeeDirectory:
+
+    def __init__(self, request=None):
+        self.request = request
+        self._people = {}
+        self._roles = {}
+        self._avatar_urls = {}
+        self._media_url = None
+        self._version = data_version() if _ttl() else None
+
+    # -- process-level layer
+    def _shared_get(self, key):
+        entry = _shared.get(key)
+        if entry is None:
+            return None
+        expires_at, version, value = entry
+        if expires_at < time.monotonic() or version != self._version:
+            _shared.pop(key, None)
+            return None
+        return value
+
+    def _shared_set(self, key, value):
+        _shared[key] = (time.monotonic() + _ttl(), self._version, value)
+
+    # -- lookups
+    def load(self, employee_ids):
+        """{employee_id: Person} for `employee_ids` (unknown ids are absent)"""
+        employee_ids = {employee_id for employee_id in employee_ids if employee_id}
+        missing = employee_ids - self._people.keys()
+
+        if missing and self._version is not None:
+            for employee_id in list(missing):
+                person = self._shared_get(('person', employee_id))
+                if person is not None:
+                    self._people[employee_id] = person
+                    missing.discard(employee_id)
+
+        if missing:
+            found = {
+                row[0]: Person(*row)
+                for row in Employee.objects.filter(employee_id__in=missing).values_list(*Person._fields)
+            }
+            for employee_id in missing:
+                # None marks ids known not to exist, so they aren't queried again
+                self._people[employee_id] = found.get(employee_id)
+                if self._version is not None and employee_id in found:
+                    self._shared_set(('person', employee_id), found[employee_id])
+
+        return {
+            employee_id: self._people[employee_id]
+            for employee_id in employee_ids if self._people[employee_id] is not None
+        }
+
+    def get(self, employee_id, default=None):
+        """Person for one id (loaded on first use), or `default`"""
+        if not employee_id:
+            return default
+        return self.load([employee_id]).get(employee_id, default)
+
+    def with_role(self, role):
+        """Every Person with `role`, oldest account first (as `.filter(role=...).first()` picks)"""
+        if role not in self._roles:
+            people = self._shared_get(('role', role)) if self._version is not None else None
+            if people is None:
+                people = [
+                    Person(*row)
+                    for row in Employee.objects.filter(role=role).order_by('pk').values_list(*Person._fields)
+                ]
+                if self._version is not None:
+                    self._shared_set(('role', role), people)
+            self._roles[role] = people
+            for person in people:
+                self._people.setdefault(person.employee_id, person)
+        return self._roles[role]
+
+    def first_with_role(self, role):
+        people = self.with_role(role)
+        return people[0] if people else None
+
+    def avatar_url(self, employee):
+        """Absolute avatar URL of an Employee or Person, built once per person"""
+        if employee.employee_id not in self._avatar_urls:
+            if self._media_url is None:
+                self._media_url = media_urls(self.request)
+            path = getattr(employee.avatar, 'name', employee.avatar)
+            self._avatar_urls[employee.employee_id] = self._media_url(path)
+        return self._avatar_urls[employee.employee_id]
+
+
+def directory(request):
+    """The EmployeeDirectory of one HTTP request (DRF or Django request)"""
+    request = getattr(request, '_request', request)
+    if not hasattr(request, 'employee_directory'):
+        request.employee_directory = EmployeeDirectory(request)
+    return request.employee_directory
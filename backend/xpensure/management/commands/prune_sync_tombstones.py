@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ... import sync
+
+
+class Command(BaseCommand):
+    help = "Delete SyncTombstone rows older than the delta-sync retention window"
+
+    def handle(self, *args, **options):
+        deleted = sync.prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f"Sync tombstones pruned: {deleted} rows"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ... import rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the ApproverQueueStats table from the Reimbursement and AdvanceRequest tables"
+
+    def handle(self, *args, **options):
+        written = rollups.rebuild_queue_stats()
+        self.stdout.write(self.style.SUCCESS(f"Approver queue stats rebuilt: {written} rows"))
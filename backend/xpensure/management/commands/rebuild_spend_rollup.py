@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ... import rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailySpendRollup table from the Reimbursement and AdvanceRequest tables"
+
+    def handle(self, *args, **options):
+        written = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Daily spend rollup rebuilt: {written} rows"))
@@ -0,0 +1,50 @@
+import re
+
+try:
+    import brotli
+except ImportError:  # optional - gzip only
+    brotli = None
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+# -----------------------------
+# Response compression
+# -----------------------------
+# Dashboard and list payloads are large, repetitive JSON. Responses of at
+# least API_COMPRESSION_MIN_SIZE bytes are sent brotli-compressed to clients
+# that accept `br` (when the brotli package is installed) and gzipped
+# otherwise; smaller ones go out as-is, where compressing costs more than it
+# saves. Streaming responses (CSV exports) are gzipped chunk by chunk.
+re_accepts_brotli = re.compile(r'\bbr\b')
+
+# Quality 5 is close to gzip's speed while still clearly smaller
+BROTLI_QUALITY = 5
+
+
+class CompressionMiddleware(GZipMiddleware):
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.streaming and len(response.content) < getattr(settings, 'API_COMPRESSION_MIN_SIZE', 1024):
+            return response
+
+        accepts = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is None or response.streaming or not re_accepts_brotli.search(accepts):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+
+        # Weak ETag, as GZipMiddleware does - conditional_get() accepts W/ tags
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Xpensure', '0005_advancerequest_approved_by_hr'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySpendRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('request_type', models.CharField(choices=[('reimbursement', 'Reimbursement'), ('advance', 'Advance')], max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('department', models.CharField(blank=True, default='', max_length=50)),
+                ('project_id', models.CharField(blank=True, default='', max_length=100)),
+                ('count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'status'], name='Xpensure_da_day_396c6d_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'request_type', 'status', 'department', 'project_id'), name='unique_daily_spend_rollup_key')],
+            },
+        ),
+    ]
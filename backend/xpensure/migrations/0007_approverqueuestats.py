@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Xpensure', '0006_dailyspendrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApproverQueueStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('approver_id', models.CharField(max_length=50)),
+                ('request_type', models.CharField(choices=[('reimbursement', 'Reimbursement'), ('advance', 'Advance')], max_length=20)),
+                ('status', models.CharField(default='Pending', max_length=20)),
+                ('pending_count', models.IntegerField(default=0)),
+                ('pending_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('approver_id', 'request_type', 'status'), name='unique_approver_queue_stats_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Xpensure', '0007_approverqueuestats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='advancerequest',
+            index=models.Index(fields=['employee', 'created_at', 'id'], name='advance_employee_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='advancerequest',
+            index=models.Index(fields=['current_approver_id', 'status', 'created_at', 'id'], name='advance_approver_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reimbursement',
+            index=models.Index(fields=['employee', 'created_at', 'id'], name='reimb_employee_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reimbursement',
+            index=models.Index(fields=['current_approver_id', 'status', 'created_at', 'id'], name='reimb_approver_created_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Xpensure', '0008_request_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('employee_id', models.CharField(max_length=50)),
+                ('request_type', models.CharField(choices=[('reimbursement', 'Reimbursement'), ('advance', 'Advance')], max_length=20)),
+                ('request_id', models.IntegerField()),
+                ('removed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['employee_id', 'removed_at'], name='Xpensure_sy_employe_dd9640_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Xpensure', '0009_synctombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='advancerequest',
+            name='approval_route',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='reimbursement',
+            name='approval_route',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
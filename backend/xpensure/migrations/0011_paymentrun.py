@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Xpensure', '0010_request_approval_route'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('paid_at', models.DateTimeField()),
+                ('request_count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payment_runs', to=settings.AUTH_USER_MODEL, to_field='employee_id')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='advancerequest',
+            name='payment_run',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='advances', to='Xpensure.paymentrun'),
+        ),
+        migrations.AddField(
+            model_name='reimbursement',
+            name='payment_run',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reimbursements', to='Xpensure.paymentrun'),
+        ),
+    ]
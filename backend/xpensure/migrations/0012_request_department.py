@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:46
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_department(apps, schema_editor):
+    """Existing requests take their submitter's current department"""
+    Employee = apps.get_model('Xpensure', 'Employee')
+    department = Subquery(Employee.objects.filter(employee_id=OuterRef('employee_id')).values('department')[:1])
+    for name in ('Reimbursement', 'AdvanceRequest'):
+        apps.get_model('Xpensure', name).objects.filter(employee__isnull=False).update(
+            department=Coalesce(department, Value('')),
+        )
+
+
+def rebuild_spend_rollup(apps, schema_editor):
+    # The rollup table was never backfilled when it was added (0006) - fill it from the requests
+    from .. import rollups
+    rollups.rebuild(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Xpensure', '0011_paymentrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='advancerequest',
+            name='department',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='reimbursement',
+            name='department',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.RunPython(backfill_department, migrations.RunPython.noop),
+        migrations.RunPython(rebuild_spend_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def rebuild_queue_stats(apps, schema_editor):
+    # The queue counters were never backfilled when they were added (0007) - fill them from the requests
+    from .. import rollups
+    rollups.rebuild_queue_stats(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Xpensure', '0012_request_department'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_queue_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Xpensure', '0013_backfill_approver_queue_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='approvalhistory',
+            index=models.Index(fields=['request_type', 'request_id', 'timestamp'], name='history_request_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='approvalhistory',
+            index=models.Index(fields=['approver_id'], name='history_approver_idx'),
+        ),
+    ]
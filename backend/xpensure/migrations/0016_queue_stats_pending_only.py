@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def rebuild_queue_stats(apps, schema_editor):
+    # The counters now track Pending items only - drop the Approved rows nothing reads
+    from .. import rollups
+    rollups.rebuild_queue_stats(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Xpensure', '0015_dataversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_queue_stats, migrations.RunPython.noop),
+    ]
@@ -84,6 +84,8 @@ class Reimbursement(models.Model):
         blank=True,
         related_name="reimbursements",
     )
+    # ✅ Submitter's department at submission - spend rollups count the request under it
+    department = models.CharField(max_length=50, blank=True, default="")
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField(blank=True, null=True)
     attachment = models.FileField(upload_to="reimbursements/", blank=True, null=True)
@@ -94,22 +96,40 @@ class Reimbursement(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="Pending")
     currentStep = models.IntegerField(default=0)
     current_approver_id = models.CharField(max_length=50, null=True, blank=True)
+    # ✅ Approver ids in order, resolved at submission; route[currentStep] is the current approver
+    approval_route = models.JSONField(default=list, blank=True)
     rejection_reason = models.TextField(blank=True, null=True)
     payments = models.JSONField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     payment_date = models.DateTimeField(null=True, blank=True)  # ✅ ADDED PAYMENT DATE FIELD
+    # ✅ Set when paid in a batch payment run
+    payment_run = models.ForeignKey(
+        "PaymentRun", on_delete=models.SET_NULL, null=True, blank=True, related_name="reimbursements",
+    )
     final_approver = models.CharField(max_length=50, null=True, blank=True)  # ✅ ADDED FINAL APPROVER FIELD
     approved_by_ceo = models.BooleanField(default=False)  # ✅ ADDED CEO APPROVAL FLAG
     approved_by_finance = models.BooleanField(default=False)  # ✅ ADDED FINANCE APPROVAL FLAG
     project_id = models.CharField(max_length=100, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of "my requests" / approver inbox on (created_at, id)
+            models.Index(fields=["employee", "created_at", "id"], name="reimb_employee_created_idx"),
+            models.Index(fields=["current_approver_id", "status", "created_at", "id"], name="reimb_approver_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.employee_id_display} - {self.amount}"
 
     @property
     def employee_id_display(self):
         return self.employee.employee_id if self.employee else "Deleted Employee"
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.department and self.employee_id:
+            self.department = self.employee.department or ""
+        super().save(*args, **kwargs)
     
     
 
@@ -133,6 +153,8 @@ class AdvanceRequest(models.Model):
         blank=True,
         related_name="advances",
     )
+    # ✅ Submitter's department at submission - spend rollups count the request under it
+    department = models.CharField(max_length=50, blank=True, default="")
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField()
     request_date = models.DateField()
@@ -143,6 +165,8 @@ class AdvanceRequest(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="Pending")
     currentStep = models.IntegerField(default=0)
     current_approver_id = models.CharField(max_length=50, null=True, blank=True)
+    # ✅ Approver ids in order, resolved at submission; route[currentStep] is the current approver
+    approval_route = models.JSONField(default=list, blank=True)
     rejection_reason = models.TextField(blank=True, null=True)
     project_id = models.CharField(max_length=100, blank=True, null=True)
     project_name = models.CharField(max_length=200, blank=True, null=True)
@@ -151,17 +175,33 @@ class AdvanceRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     payment_date = models.DateTimeField(null=True, blank=True)  # ✅ ADDED PAYMENT DATE FIELD
+    # ✅ Set when paid in a batch payment run
+    payment_run = models.ForeignKey(
+        "PaymentRun", on_delete=models.SET_NULL, null=True, blank=True, related_name="advances",
+    )
     final_approver = models.CharField(max_length=50, null=True, blank=True)  # ✅ ADDED FINAL APPROVER FIELD
     approved_by_ceo = models.BooleanField(default=False)  # ✅ ADDED CEO APPROVAL FLAG
     approved_by_finance = models.BooleanField(default=False)  # ✅ ADDED FINANCE APPROVAL FLAG
     approved_by_hr = models.BooleanField(default=False)   # ✅ ADDED HR APPROVAL FLAG
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of "my requests" / approver inbox on (created_at, id)
+            models.Index(fields=["employee", "created_at", "id"], name="advance_employee_created_idx"),
+            models.Index(fields=["current_approver_id", "status", "created_at", "id"], name="advance_approver_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.employee_id_display} - {self.amount}"
 
     @property
     def employee_id_display(self):
         return self.employee.employee_id if self.employee else "Deleted Employee"
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.department and self.employee_id:
+            self.department = self.employee.department or ""
+        super().save(*args, **kwargs)
     
 class ApprovalHistory(models.Model):
     REQUEST_TYPES = [
@@ -185,6 +225,133 @@ class ApprovalHistory(models.Model):
     
     class Meta:
         db_table = 'Xpensure_approvalhistory'
+        indexes = [
+            # A request's events in order (timelines, "previous event" lookups of the latency analytics)
+            models.Index(fields=["request_type", "request_id", "timestamp"], name="history_request_time_idx"),
+            models.Index(fields=["approver_id"], name="history_approver_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.request_type} {self.request_id} - {self.action} by {self.approver_id}"
+
+# -----------------------------
+# Daily Spend Rollup (dashboard read model)
+# -----------------------------
+class DailySpendRollup(models.Model):
+    """
+    Pre-aggregated count/amount per (day, request type, status, department, project).
+    `day` is the request's own date (Reimbursement.date / AdvanceRequest.request_date).
+    Maintained incrementally by xpensure/rollups.py; rebuild with
+    `python manage.py rebuild_spend_rollup`.
+    """
+    day = models.DateField()
+    request_type = models.CharField(max_length=20, choices=ApprovalHistory.REQUEST_TYPES)
+    status = models.CharField(max_length=20)
+    department = models.CharField(max_length=50, blank=True, default="")
+    project_id = models.CharField(max_length=100, blank=True, default="")
+    count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "request_type", "status", "department", "project_id"],
+                name="unique_daily_spend_rollup_key",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["day", "status"]),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.request_type} {self.status} - {self.count} / {self.amount}"
+
+
+# -----------------------------
+# Approver Queue Stats (inbox counters)
+# -----------------------------
+class ApproverQueueStats(models.Model):
+    """
+    Pending items currently assigned to an approver, per request type and
+    status (rollups.QUEUE_STATUSES). Maintained by xpensure/rollups.py alongside
+    DailySpendRollup; rebuild with `python manage.py rebuild_queue_stats`.
+    """
+    approver_id = models.CharField(max_length=50)
+    request_type = models.CharField(max_length=20, choices=ApprovalHistory.REQUEST_TYPES)
+    status = models.CharField(max_length=20, default="Pending")
+    pending_count = models.IntegerField(default=0)
+    pending_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["approver_id", "request_type", "status"],
+                name="unique_approver_queue_stats_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.approver_id} {self.request_type} {self.status} - {self.pending_count} / {self.pending_amount}"
+
+
+# -----------------------------
+# Data Version (cache invalidation counter)
+# -----------------------------
+class DataVersion(models.Model):
+    """
+    Single row (pk=1) bumped on every data change by xpensure/dashboard_cache.py.
+    Kept in the database rather than the cache so every worker process reads
+    the same version - the default cache (LocMemCache) is per process.
+    """
+    value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"Data version {self.value}"
+
+
+# -----------------------------
+# Sync Tombstones (delta-sync removals)
+# -----------------------------
+class SyncTombstone(models.Model):
+    """
+    A request that left an employee's synced lists: it was deleted, or it was
+    in their queue and moved on to someone else. Written by xpensure/rollups.py
+    at the same points as the read models; served by the delta-sync endpoint.
+    """
+    employee_id = models.CharField(max_length=50)
+    request_type = models.CharField(max_length=20, choices=ApprovalHistory.REQUEST_TYPES)
+    request_id = models.IntegerField()
+    removed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["employee_id", "removed_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.request_type} {self.request_id} removed for {self.employee_id}"
+
+
+# -----------------------------
+# Payment Run (batch payments)
+# -----------------------------
+class PaymentRun(models.Model):
+    """
+    One Finance Payment batch: every request it paid points at it (payment_run)
+    and has paid_at as its payment_date. The batch file is built from those
+    requests when it is downloaded.
+    """
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        to_field="employee_id",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="payment_runs",
+    )
+    paid_at = models.DateTimeField()
+    request_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
 
     def __str__(self):
-        return f"{self.request_type} {self.request_id} - {self.action} by {self.approver_id}"
\ No newline at end of file
+        return f"Payment run {self.id} ({self.paid_at:%Y-%m-%d}) - {self.request_count} / {self.total_amount}"
@@ -0,0 +1,137 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Employee
+
+# -----------------------------
+# Org-chart index for approval routing
+# -----------------------------
+# get_next_approver() follows report_to edges and falls back to the first
+# holder of a role (Finance Verification, HR, CEO, Finance Payment). The
+# whole org chart is small, so each process keeps it in memory: every
+# employee's role and report_to, and the first holder of every role (oldest
+# account, as `.filter(role=...).first()` picks). Routing - the next hop, or
+# the full route resolved at submission - then needs no queries.
+#
+# The index is stamped with an org-chart version kept in the cache. Saving or
+# deleting an Employee (signal handlers connected in apps.py) bumps it, and
+# the index is rebuilt - one query - on the next lookup. The version is only
+# seen by processes sharing that cache: with a per-process cache (LocMemCache,
+# the default in settings) just the process that made the change sees the
+# bump. Every index is therefore also rebuilt once it is older than
+# settings.ORG_CHART_TTL seconds, which bounds how long other workers route
+# from a stale org chart.
+# Bulk `.update()`s bypass the signals; call bump_org_chart_version() after them.
+ORG_CHART_VERSION_KEY = 'xpensure:org-chart-version'
+
+# Fields routing reads; saves that touch none of them (e.g. last_login) keep the index
+ROUTING_FIELDS = frozenset({'employee_id', 'role', 'report_to'})
+
+_index = None
+
+
+def _ttl():
+    return getattr(settings, 'ORG_CHART_TTL', 30)
+
+
+def _initial_version():
+    # Not 1: after an eviction / cache clear the version must not match an index built before it
+    return time.time_ns()
+
+
+def org_chart_version():
+    version = cache.get(ORG_CHART_VERSION_KEY)
+    if version is None:
+        cache.add(ORG_CHART_VERSION_KEY, _initial_version(), timeout=None)
+        version = cache.get(ORG_CHART_VERSION_KEY)
+    return version
+
+
+def bump_org_chart_version():
+    try:
+        cache.incr(ORG_CHART_VERSION_KEY)
+    except ValueError:
+        # Key evicted / never set - a fresh value invalidates every process's index
+        cache.add(ORG_CHART_VERSION_KEY, _initial_version(), timeout=None)
+
+
+# Longest route resolved at submission (guards against report_to cycles)
+MAX_ROUTE_LENGTH = 20
+
+
+class OrgChart:
+    def __init__(self, version, rows):
+        """rows: (employee_id, role, report_to) ordered by pk"""
+        self.version = version
+        self.built_at = time.monotonic()
+        self.people = {}
+        self.role_holders = {}
+        for employee_id, role, report_to in rows:
+            self.people[employee_id] = (role, report_to)
+            self.role_holders.setdefault(role, employee_id)
+
+    def exists(self, employee_id):
+        return employee_id in self.people
+
+    def first_with_role(self, role):
+        """employee_id of the role's first holder, or None"""
+        return self.role_holders.get(role)
+
+    def next_approver(self, role, report_to, request_type=None):
+        """Who gets a request after an approver with `role` / `report_to` approved it (None: nobody)"""
+        # SIMPLE RULE: ALWAYS follow report_to if it exists
+        # ✅ FIX: ALWAYS the IMMEDIATE next user - don't recursively skip Common users
+        if report_to and report_to in self.people:
+            return report_to
+
+        # No report_to or user doesn't exist: auto-determine next based on current role
+        if role == "Common":
+            # End of Common chain, go to Finance Verification
+            return self.first_with_role("Finance Verification")
+        elif role == "Finance Verification":
+            return self.first_with_role("CEO" if request_type == "reimbursement" else "HR")
+        elif role == "HR":
+            return self.first_with_role("CEO")
+        elif role == "CEO":
+            return self.first_with_role("Finance Payment")
+        return None
+
+    def route(self, first_approver, request_type):
+        """
+        Every approver a request starting at `first_approver` passes, in order
+        - the hops next_approver() makes one approval at a time. Stops at an
+        unknown employee, a repeat (report_to cycle) or MAX_ROUTE_LENGTH.
+        """
+        route = []
+        approver_id = first_approver
+        while approver_id and approver_id not in route and len(route) < MAX_ROUTE_LENGTH:
+            route.append(approver_id)
+            if approver_id not in self.people:
+                break
+            role, report_to = self.people[approver_id]
+            approver_id = self.next_approver(role, report_to, request_type)
+        return route
+
+
+def org_chart():
+    """The current OrgChart (rebuilt when the org-chart version moved or it is older than ORG_CHART_TTL)"""
+    global _index
+    version = org_chart_version()
+    index = _index
+    if index is None or index.version != version or time.monotonic() - index.built_at >= _ttl():
+        index = OrgChart(
+            version, Employee.objects.order_by('pk').values_list('employee_id', 'role', 'report_to'),
+        )
+        _index = index
+    return index
+
+
+def employee_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or ROUTING_FIELDS & set(update_fields):
+        bump_org_chart_version()
+
+
+def employee_deleted(sender, instance, **kwargs):
+    bump_org_chart_version()
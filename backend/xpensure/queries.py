@@ -0,0 +1,338 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+from operator import itemgetter
+
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db.models import BooleanField, CharField, DateField, F, Q, Value
+from django.utils.encoding import filepath_to_uri
+
+from .models import Reimbursement, AdvanceRequest
+
+# -----------------------------
+# Unified expense-request read layer
+# -----------------------------
+# Reimbursement and AdvanceRequest share most of their columns. These helpers
+# project both tables onto the same column set (plus a `request_type`
+# discriminator) and combine them with UNION ALL, so dashboards can filter,
+# order and slice one query instead of merging two lists in Python.
+#
+# Column names that differ per table are exposed under neutral aliases:
+#   expense_date        Reimbursement.date / AdvanceRequest.request_date
+#   advance_project_date  AdvanceRequest.project_date (NULL for reimbursements)
+#   project_title       AdvanceRequest.project_name (NULL for reimbursements)
+#   hr_approved         AdvanceRequest.approved_by_hr (False for reimbursements)
+REQUEST_FIELDS = (
+    'id', 'employee_id', 'amount', 'description', 'status', 'currentStep',
+    'current_approver_id', 'rejection_reason', 'project_id', 'payments',
+    'attachments', 'created_at', 'updated_at', 'payment_date',
+    'final_approver', 'approved_by_ceo', 'approved_by_finance',
+)
+
+
+def _typed_columns(request_type):
+    if request_type == 'reimbursement':
+        columns = {
+            'expense_date': F('date'),
+            'advance_project_date': Value(None, output_field=DateField()),
+            'project_title': Value(None, output_field=CharField()),
+            'hr_approved': Value(False, output_field=BooleanField()),
+        }
+    else:
+        columns = {
+            'expense_date': F('request_date'),
+            'advance_project_date': F('project_date'),
+            'project_title': F('project_name'),
+            'hr_approved': F('approved_by_hr'),
+        }
+    columns.update(
+        request_type=Value(request_type, output_field=CharField()),
+        employee_name=F('employee__fullName'),
+        employee_avatar=F('employee__avatar'),
+        employee_department=F('employee__department'),
+        employee_email=F('employee__email'),
+    )
+    return columns
+
+
+def request_rows(queryset, request_type):
+    """`.values()` rows of one request table in the unified column layout"""
+    return queryset.values(*REQUEST_FIELDS, **_typed_columns(request_type))
+
+
+def expense_requests(reimbursements, advances):
+    """
+    UNION ALL of the two (already filtered) querysets as dict rows.
+    Order and slice the result as usual, e.g. `.order_by('-created_at')[:50]`.
+    """
+    return request_rows(reimbursements, 'reimbursement').union(
+        request_rows(advances, 'advance'),
+        all=True,
+    )
+
+
+def requests_for_history(history):
+    """
+    {(request_type, request_id): request} for every request a batch of
+    ApprovalHistory rows points at - one query per request table (employee
+    joined) instead of a .get() per row. Deleted requests are simply absent.
+    """
+    ids = history_request_ids(history)
+    found = {}
+    for request_type, model in (('reimbursement', Reimbursement), ('advance', AdvanceRequest)):
+        if ids[request_type]:
+            for obj in model.objects.filter(id__in=ids[request_type]).select_related('employee'):
+                found[(request_type, obj.id)] = obj
+    return found
+
+
+def _history_request_type(entry):
+    return 'reimbursement' if entry.request_type == 'reimbursement' else 'advance'
+
+
+def history_request_ids(history):
+    """{request_type: set of request ids} referenced by ApprovalHistory rows"""
+    ids = {'reimbursement': set(), 'advance': set()}
+    for entry in history:
+        ids[_history_request_type(entry)].add(entry.request_id)
+    return ids
+
+
+def history_request(requests, entry):
+    """The request an ApprovalHistory row points at, from a requests_for_history() map (None if deleted)"""
+    return requests.get((_history_request_type(entry), entry.request_id))
+
+
+def media_url(request, path):
+    """Absolute URL for a stored media path (same as request.build_absolute_uri(field.url))"""
+    if not path:
+        return None
+    return request.build_absolute_uri(default_storage.url(path))
+
+
+def media_urls(request):
+    """
+    media_url() bound to one request. For file-system storage the absolute
+    MEDIA_URL prefix is resolved once and each path is appended to it.
+    """
+    if not isinstance(default_storage, FileSystemStorage):
+        return lambda path: media_url(request, path)
+
+    prefix = request.build_absolute_uri(default_storage.url(''))
+
+    def url(path):
+        if not path:
+            return None
+        return prefix + filepath_to_uri(path).lstrip('/')
+
+    return url
+
+
+# -----------------------------
+# Compiled row serializers
+# -----------------------------
+# Dashboards turn request rows into response dicts. A RowSerializer is
+# declared once at import time from its output fields; it selects only the
+# columns those fields read, as `.values_list()` tuples of the unified
+# layout above, and builds each dict with one zip over a precomputed
+# itemgetter - no model instances, and media URLs are appended to a prefix
+# resolved once per request.
+#
+# select() narrows a serializer to the keys a client asked for
+# (?fields= / ?exclude=, see FieldSelection), which drops the columns only
+# those keys needed from the SQL as well as from the JSON.
+RowField = namedtuple('RowField', ['key', 'column', 'convert', 'request_type'])
+
+# Always selected, even when no output key reads them: ordering, keyset
+# positions and (request_type, id) keys are built from these
+SORT_COLUMNS = ('id', 'created_at', 'updated_at')
+
+
+class per_request:
+    """convert that needs the HTTP request: factory(request) -> converter, built once per serialize()"""
+
+    def __init__(self, factory):
+        self.factory = factory
+
+
+MEDIA = per_request(media_urls)  # convert: stored media path -> absolute URL
+
+
+def field(key, column=None, convert=None, request_type=None):
+    """
+    Output `key` read from unified `column` (default: same name), passed
+    through `convert` (a callable or per_request) and, with `request_type`,
+    only present on rows of that type.
+    """
+    return RowField(key, column or key, convert, request_type)
+
+
+def or_empty(value):
+    """convert: NULL/empty JSON list -> []"""
+    return value if value else []
+
+
+def strftime(fmt):
+    """convert: date/datetime -> `fmt` string (None stays None)"""
+    return lambda value: value.strftime(fmt) if value else None
+
+
+def isoformat(value):
+    """convert: date/datetime -> ISO string (None stays None)"""
+    return value.isoformat() if value else None
+
+
+def request_tuples(queryset, request_type, columns):
+    """`.values_list()` tuples of one request table with just `columns` of the unified layout"""
+    typed = _typed_columns(request_type)
+    return queryset.annotate(**{c: typed[c] for c in columns if c in typed}).values_list(*columns)
+
+
+class RowSerializer:
+    def __init__(self, *fields):
+        self.fields = tuple(f if isinstance(f, RowField) else field(f) for f in fields)
+        self.keys = tuple(dict.fromkeys(f.key for f in self.fields))
+        # request_type first: serialize() picks the per-type plan from row[0]
+        self.columns = ('request_type',) + tuple(dict.fromkeys(
+            [f.column for f in self.fields if f.column != 'request_type'] + list(SORT_COLUMNS)
+        ))
+        self.key = itemgetter(0, self.columns.index('id'))  # row -> (request_type, id)
+        self.position = itemgetter(self.columns.index('created_at'), self.columns.index('id'))  # keyset_page()
+        self._plans = {request_type: self._plan(request_type) for request_type in ('reimbursement', 'advance')}
+
+    def _plan(self, request_type):
+        fields = [f for f in self.fields if f.request_type in (None, request_type)]
+        indexes = [self.columns.index(f.column) for f in fields]
+        if len(indexes) > 1:
+            getter = itemgetter(*indexes)
+        else:
+            getter = (lambda row, i=indexes[0]: (row[i],)) if indexes else (lambda row: ())
+        converters = [(f.key, f.convert) for f in fields if f.convert is not None]
+        return tuple(f.key for f in fields), getter, converters
+
+    def select(self, selection):
+        """A serializer with just the keys a FieldSelection asks for (self when it asks for everything)"""
+        if selection.everything:
+            return self
+        return RowSerializer(*(f for f in self.fields if selection.wants(f.key)))
+
+    def table(self, queryset, request_type):
+        """Rows of one request table"""
+        return request_tuples(queryset, request_type, self.columns)
+
+    def union(self, reimbursements, advances):
+        """UNION ALL of both tables; order and slice as usual"""
+        return self.table(reimbursements, 'reimbursement').union(self.table(advances, 'advance'), all=True)
+
+    def items(self, rows, request):
+        """(row, response dict) pairs for `rows` (from table() / union())"""
+        plans = {}
+        for request_type, (keys, getter, converters) in self._plans.items():
+            converters = [
+                (key, convert.factory(request) if isinstance(convert, per_request) else convert)
+                for key, convert in converters
+            ]
+            plans[request_type] = (keys, getter, converters)
+
+        for row in rows:
+            keys, getter, converters = plans[row[0]]
+            item = dict(zip(keys, getter(row)))
+            for key, convert in converters:
+                item[key] = convert(item[key])
+            yield row, item
+
+    def serialize(self, rows, request):
+        """Response dicts for `rows`"""
+        return [item for _, item in self.items(rows, request)]
+
+    def serialize_by_type(self, rows, request):
+        """{'reimbursement': [...], 'advance': [...]} response dicts, in row order"""
+        grouped = {'reimbursement': [], 'advance': []}
+        for row, item in self.items(rows, request):
+            grouped[row[0]].append(item)
+        return grouped
+
+    def serialize_by_key(self, rows, request):
+        """{(request_type, id): response dict}"""
+        return {self.key(row): item for row, item in self.items(rows, request)}
+
+
+class FieldSelection:
+    """
+    Sparse fieldset of a list request: ?fields=a,b keeps only those keys of
+    every row, ?exclude=c,d drops them. Applies to the row dicts inside the
+    response, not to its top-level counters.
+    """
+
+    def __init__(self, params):
+        self.fields = self._names(params.get('fields'))
+        self.exclude = self._names(params.get('exclude')) or set()
+        self.everything = self.fields is None and not self.exclude
+
+    @staticmethod
+    def _names(value):
+        if value is None:
+            return None
+        return {name.strip() for name in value.split(',') if name.strip()}
+
+    def wants(self, key):
+        return (self.fields is None or key in self.fields) and key not in self.exclude
+
+    def check(self, *known):
+        """Raise ValueError for requested names no row can contain (`known`: RowSerializers or iterables of keys)"""
+        valid = set()
+        for keys in known:
+            valid.update(keys.keys if isinstance(keys, RowSerializer) else keys)
+        unknown = ((self.fields or set()) | self.exclude) - valid
+        if unknown:
+            raise ValueError(
+                f"Unknown field(s): {', '.join(sorted(unknown))}. Available: {', '.join(sorted(valid))}"
+            )
+        return self
+
+
+# -----------------------------
+# Keyset (cursor) pagination on (created_at, id)
+# -----------------------------
+def keyset_page(rows, after, limit, newest_first=False, position=itemgetter('created_at', 'id')):
+    """
+    One page of `rows` ordered by (created_at, id) - oldest first, or newest
+    first with `newest_first` - starting after the `after` position
+    ((created_at, id) or None). Uses a range condition instead of OFFSET, so
+    every page costs the same. Returns (page, position of the page's last
+    row, or None when there are no more rows); `position` reads it from a
+    row (RowSerializer.position for tuple rows).
+    """
+    direction = 'lt' if newest_first else 'gt'
+    if after:
+        created_at, row_id = after
+        rows = rows.filter(
+            Q(**{f'created_at__{direction}': created_at})
+            | Q(created_at=created_at, **{f'id__{direction}': row_id})
+        )
+    order = ('-created_at', '-id') if newest_first else ('created_at', 'id')
+
+    page = list(rows.order_by(*order)[:limit + 1])
+    if len(page) <= limit:
+        return page, None
+    page = page[:limit]
+    return page, position(page[-1])
+
+
+def encode_cursor(positions):
+    """Opaque token for {list name: (created_at, id)}"""
+    payload = {name: [created_at.isoformat(), row_id] for name, (created_at, row_id) in positions.items()}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; raises ValueError for anything malformed"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return {
+            name: (datetime.fromisoformat(created_at), int(row_id))
+            for name, (created_at, row_id) in payload.items()
+        }
+    except (TypeError, AttributeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
@@ -0,0 +1,35 @@
+try:
+    import orjson
+except ImportError:  # optional - fall back to the stock renderer
+    orjson = None
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# -----------------------------
+# Fast JSON rendering
+# -----------------------------
+# orjson encodes dicts, lists, str/int/float and date/datetime/time/UUID in
+# native code; everything else (Decimal, lazy translation strings, querysets)
+# goes through DRF's own encoder, so the bytes match the stock JSONRenderer:
+# Decimal -> float, aware UTC datetimes end in "Z", non-string keys become
+# strings. Indented output (browsable API, `; indent=`) uses the stock path.
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+_fallback = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_fallback, option=ORJSON_OPTIONS)
+        # Same as JSONRenderer: U+2028 / U+2029 are valid JSON but not valid JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,223 @@
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Reimbursement, AdvanceRequest, DailySpendRollup, ApproverQueueStats, SyncTombstone
+
+# -----------------------------
+# Read-model maintenance (DailySpendRollup + ApproverQueueStats + SyncTombstone)
+# -----------------------------
+# Call snapshot() BEFORE changing a request and record() AFTER saving it;
+# the rows the request used to count in are decremented and the new ones
+# incremented. New requests just call record(obj).
+KEY_FIELDS = ('day', 'request_type', 'status', 'department', 'project_id')
+QUEUE_KEY_FIELDS = ('approver_id', 'request_type', 'status')
+
+# Statuses that keep a request in its current approver's inbox
+# (Approved = waiting for Finance Payment)
+OPEN_STATUSES = ('Pending', 'Approved')
+
+# Statuses ApproverQueueStats counts. Only Pending inboxes are read from it;
+# Finance Payment's "ready" list spans every payer (see payment_ready_filter()
+# in views.py), so per-approver Approved counters would have no reader.
+QUEUE_STATUSES = ('Pending',)
+
+RequestState = namedtuple('RequestState', ['rollup_key', 'amount', 'queue_key', 'employee_id', 'inbox_id'])
+
+
+def _request_type(request_obj):
+    return 'reimbursement' if isinstance(request_obj, Reimbursement) else 'advance'
+
+
+def snapshot(request_obj):
+    """Rollup key, amount, approver-queue key, owner and inbox holder of the request's current state"""
+    request_type = _request_type(request_obj)
+    day = request_obj.date if request_type == 'reimbursement' else request_obj.request_date
+    # The department stored at submission, so moving the employee later doesn't orphan the row
+    rollup_key = (day, request_type, request_obj.status, request_obj.department or '', request_obj.project_id or '')
+
+    # Whose inbox (and synced list) it is in; the queue counters track a subset of those statuses
+    inbox_id = request_obj.current_approver_id if request_obj.status in OPEN_STATUSES else None
+    queue_key = None
+    if inbox_id and request_obj.status in QUEUE_STATUSES:
+        queue_key = (inbox_id, request_type, request_obj.status)
+
+    return RequestState(rollup_key, Decimal(str(request_obj.amount)), queue_key, request_obj.employee_id, inbox_id)
+
+
+def _increment(model, lookup, **deltas):
+    """Add `deltas` to the row identified by `lookup`, creating it if needed"""
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Created concurrently - fall back to the increment
+        model.objects.filter(**lookup).update(**changes)
+
+
+def _adjust(key, count, amount):
+    _increment(DailySpendRollup, dict(zip(KEY_FIELDS, key)), count=count, amount=amount)
+
+
+def _adjust_queue(key, count, amount):
+    _increment(ApproverQueueStats, dict(zip(QUEUE_KEY_FIELDS, key)), pending_count=count, pending_amount=amount)
+
+
+def record(request_obj, before=None):
+    """Move the request's contribution from the `before` snapshot to its current state"""
+    record_many([(request_obj, before)])
+
+
+def record_many(changes):
+    """
+    record() for many (request_obj, before) pairs: the deltas are summed per
+    rollup / queue row first, so a batch that moves 50 requests out of one
+    approver's queue updates that row once. Tombstones go in one bulk insert.
+    """
+    rollup_deltas = defaultdict(lambda: [0, Decimal('0')])
+    queue_deltas = defaultdict(lambda: [0, Decimal('0')])
+    tombstones = []
+
+    def add(deltas, key, count, amount):
+        deltas[key][0] += count
+        deltas[key][1] += amount
+
+    for request_obj, before in changes:
+        after = snapshot(request_obj)
+        if before == after:
+            continue
+
+        if before is None or (before.rollup_key, before.amount) != (after.rollup_key, after.amount):
+            if before is not None:
+                add(rollup_deltas, before.rollup_key, -1, -before.amount)
+            add(rollup_deltas, after.rollup_key, 1, after.amount)
+
+        if before is None or (before.queue_key, before.amount) != (after.queue_key, after.amount):
+            if before is not None and before.queue_key:
+                add(queue_deltas, before.queue_key, -1, -before.amount)
+            if after.queue_key:
+                add(queue_deltas, after.queue_key, 1, after.amount)
+
+        # Left the previous approver's queue - tell their synced clients
+        if before is not None and before.inbox_id and after.inbox_id != before.inbox_id:
+            tombstones.append(_tombstone_row(request_obj, before.inbox_id))
+
+    if not (rollup_deltas or queue_deltas or tombstones):
+        return
+
+    with transaction.atomic():
+        for key, (count, amount) in rollup_deltas.items():
+            if count or amount:
+                _adjust(key, count, amount)
+        for key, (count, amount) in queue_deltas.items():
+            if count or amount:
+                _adjust_queue(key, count, amount)
+        SyncTombstone.objects.bulk_create(tombstones)
+
+
+def _tombstone_row(request_obj, employee_id):
+    return SyncTombstone(
+        employee_id=employee_id,
+        request_type=_request_type(request_obj),
+        request_id=request_obj.id,
+    )
+
+
+def _tombstone(request_obj, employee_id):
+    _tombstone_row(request_obj, employee_id).save()
+
+
+def discard(request_obj):
+    """Remove a request (about to be deleted) from the read models"""
+    state = snapshot(request_obj)
+    with transaction.atomic():
+        _adjust(state.rollup_key, -1, -state.amount)
+        if state.queue_key:
+            _adjust_queue(state.queue_key, -1, -state.amount)
+
+        # Gone from the owner's and the current approver's synced lists
+        removed_for = {state.employee_id, state.inbox_id}
+        for employee_id in removed_for - {None, ''}:
+            _tombstone(request_obj, employee_id)
+
+
+def _models(apps, *names):
+    """The named models - from a migration's `apps` when given (data migrations), else the current ones"""
+    if apps is None:
+        return [globals()[name] for name in names]
+    return [apps.get_model('Xpensure', name) for name in names]
+
+
+def rebuild(apps=None):
+    """Recompute the whole DailySpendRollup from the request tables. Returns the number of rows written."""
+    reimbursement, advance, rollup = _models(apps, 'Reimbursement', 'AdvanceRequest', 'DailySpendRollup')
+    rows = []
+    for model, request_type, date_field in (
+        (reimbursement, 'reimbursement', 'date'),
+        (advance, 'advance', 'request_date'),
+    ):
+        grouped = model.objects.values(
+            'status',
+            'department',
+            day=F(date_field),
+            project=Coalesce('project_id', Value('')),
+        ).annotate(total_count=Count('id'), total_amount=Sum('amount')).order_by()
+
+        for row in grouped:
+            rows.append(rollup(
+                day=row['day'],
+                request_type=request_type,
+                status=row['status'],
+                department=row['department'],
+                project_id=row['project'],
+                count=row['total_count'],
+                amount=row['total_amount'] or 0,
+            ))
+
+    with transaction.atomic():
+        rollup.objects.all().delete()
+        rollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def rebuild_queue_stats(apps=None):
+    """Recompute ApproverQueueStats from the request tables. Returns the number of rows written."""
+    reimbursement, advance, stats = _models(apps, 'Reimbursement', 'AdvanceRequest', 'ApproverQueueStats')
+    rows = []
+    for model, request_type in ((reimbursement, 'reimbursement'), (advance, 'advance')):
+        grouped = (
+            model.objects
+            .filter(status__in=QUEUE_STATUSES, current_approver_id__isnull=False)
+            .exclude(current_approver_id='')
+            .values('current_approver_id', 'status')
+            .annotate(total_count=Count('id'), total_amount=Sum('amount'))
+            .order_by()
+        )
+        for row in grouped:
+            rows.append(stats(
+                approver_id=row['current_approver_id'],
+                request_type=request_type,
+                status=row['status'],
+                pending_count=row['total_count'],
+                pending_amount=row['total_amount'] or 0,
+            ))
+
+    with transaction.atomic():
+        stats.objects.all().delete()
+        stats.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def queue_stats(approver_id, statuses=QUEUE_STATUSES):
+    """{request_type: (count, amount)} of one approver's pending items - a single indexed read"""
+    stats = {'reimbursement': [0, Decimal('0')], 'advance': [0, Decimal('0')]}
+    for row in ApproverQueueStats.objects.filter(approver_id=approver_id, status__in=statuses):
+        stats[row.request_type][0] += row.pending_count
+        stats[row.request_type][1] += row.pending_amount
+    return {request_type: tuple(values) for request_type, values in stats.items()}
@@ -7,6 +7,8 @@ from django.core.files.storage import default_storage
 from django.conf import settings
 from urllib.parse import urljoin
 
+from .queries import FieldSelection
+
 class EmployeeSignupSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, min_length=6)
     confirm_password = serializers.CharField(write_only=True, required=True, min_length=6)
@@ -97,7 +99,50 @@ def build_absolute_media_url(file_path):
     
     # Fallback
     return f"/media/{file_path}"
-class ReimbursementSerializer(serializers.ModelSerializer):
+
+
+class SparseFieldsMixin:
+    """
+    ?fields= / ?exclude= on GET responses: readable fields the client did not
+    ask for are dropped (write-only input fields stay). model_columns() names
+    the matching model columns for queryset.only(), so the SQL shrinks too.
+    """
+    # SerializerMethodField name -> model field it reads
+    sparse_sources = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sparse = False
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+
+        selection = FieldSelection(request.query_params)
+        if selection.everything:
+            return
+        readable = [name for name, f in self.fields.items() if not f.write_only]
+        try:
+            selection.check(readable)
+        except ValueError as e:
+            raise serializers.ValidationError({'fields': str(e)})
+        for name in readable:
+            if not selection.wants(name):
+                self.fields.pop(name)
+        self.sparse = True
+
+    def model_columns(self):
+        """Model columns the remaining readable fields read (None when every field is sent)"""
+        if not self.sparse:
+            return None
+        columns = set()
+        for name, f in self.fields.items():
+            source = self.sparse_sources.get(name, f.source)
+            if not f.write_only and source != '*':
+                columns.add(source.replace('.', '__'))
+        return columns
+
+
+class ReimbursementSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     employee_id = serializers.CharField(source="employee.employee_id", read_only=True)
     project_id = serializers.CharField(write_only=True, required=False, allow_blank=True)
     
@@ -118,6 +163,8 @@ class ReimbursementSerializer(serializers.ModelSerializer):
     attachment_urls = serializers.SerializerMethodField(read_only=True)
     projectId = serializers.CharField(source="project_id", read_only=True)
 
+    sparse_sources = {'attachment_urls': 'attachments'}
+
     class Meta:
         model = Reimbursement
         fields = [
@@ -235,7 +282,7 @@ class ReimbursementSerializer(serializers.ModelSerializer):
         
         return instance
 
-class AdvanceRequestSerializer(serializers.ModelSerializer):
+class AdvanceRequestSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     employee_id = serializers.CharField(source="employee.employee_id", read_only=True)
     
     # ✅ ADDED: Project fields
@@ -261,6 +308,8 @@ class AdvanceRequestSerializer(serializers.ModelSerializer):
     projectId = serializers.CharField(source="project_id", read_only=True)
     projectName = serializers.CharField(source="project_name", read_only=True)
 
+    sparse_sources = {'attachment_urls': 'attachments'}
+
     class Meta:
         model = AdvanceRequest
         fields = [
@@ -0,0 +1,89 @@
+import base64
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Reimbursement, AdvanceRequest, SyncTombstone
+from .rollups import OPEN_STATUSES
+
+# -----------------------------
+# Delta sync for mobile clients
+# -----------------------------
+# A client keeps the requests it can see - its own requests plus the open
+# requests waiting on it - and asks for what changed since its last token:
+# rows updated after the token (upserts) and tombstones for requests that
+# left its lists. The new token is taken BEFORE reading, minus a small
+# overlap, so a write committing during the read is picked up next time;
+# clients upsert by (request_type, id), so seeing a row twice is harmless.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+# Tokens older than this get a full snapshot instead of a delta
+SYNC_TOMBSTONE_RETENTION = timedelta(days=30)
+
+
+def encode_token(moment):
+    return base64.urlsafe_b64encode(moment.isoformat().encode()).decode()
+
+
+def decode_token(token):
+    """Inverse of encode_token; raises ValueError for anything malformed"""
+    try:
+        moment = datetime.fromisoformat(base64.urlsafe_b64decode(token.encode()).decode())
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid sync token: {e}")
+    if timezone.is_naive(moment):
+        raise ValueError("Invalid sync token: missing timezone")
+    return moment
+
+
+def visible_requests(employee_id, row_serializer, since=None):
+    """
+    UNION ALL of the caller's own requests and open requests assigned to
+    them (`row_serializer` rows), optionally changed after `since`
+    """
+    visible = Q(employee_id=employee_id) | Q(current_approver_id=employee_id, status__in=OPEN_STATUSES)
+    if since:
+        visible &= Q(updated_at__gt=since)
+    return row_serializer.union(
+        Reimbursement.objects.filter(visible),
+        AdvanceRequest.objects.filter(visible),
+    ).order_by('updated_at')
+
+
+def changes_since(employee_id, since, row_serializer):
+    """
+    (rows, tombstones, new token, full). Without `since` - or with one past
+    the tombstone retention - every visible row is returned and `full` is
+    True: the client should replace its local copy.
+    """
+    now = timezone.now()
+    full = since is None or since < now - SYNC_TOMBSTONE_RETENTION
+    rows = list(visible_requests(employee_id, row_serializer, None if full else since))
+
+    tombstones = []
+    if not full:
+        # Still visible -> the upsert wins over an older removal
+        current = {row_serializer.key(row) for row in rows}
+        for tombstone in (
+            SyncTombstone.objects
+            .filter(employee_id=employee_id, removed_at__gt=since)
+            .order_by('removed_at')
+            .values('request_type', 'request_id', 'removed_at')
+        ):
+            key = (tombstone['request_type'], tombstone['request_id'])
+            if key not in current:
+                current.add(key)
+                tombstones.append({
+                    'request_type': tombstone['request_type'],
+                    'id': tombstone['request_id'],
+                    'removed_at': tombstone['removed_at'],
+                })
+
+    return rows, tombstones, encode_token(now - SYNC_OVERLAP), full
+
+
+def prune_tombstones():
+    """Delete tombstones no client can still ask for. Returns the number deleted."""
+    deleted, _ = SyncTombstone.objects.filter(removed_at__lt=timezone.now() - SYNC_TOMBSTONE_RETENTION).delete()
+    return deleted
@@ -1,3 +1,1617 @@
-from django.test import TestCase
+import gzip
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from itertools import chain
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import rollups
+from .analytics import average_processing_hours, department_totals
+from .dashboard_cache import bump_data_version, data_version
+from .directory import EmployeeDirectory
+from .middleware import brotli
+from .renderers import FastJSONRenderer
+from .sync import decode_token, encode_token
+from .models import (
+    Employee, Reimbursement, AdvanceRequest, ApprovalHistory, ApproverQueueStats, DailySpendRollup, DataVersion,
+    PaymentRun, SyncTombstone,
+)
+from .orgchart import org_chart_version
+from .queries import expense_requests
+from .views import TransitionConflict, get_next_approver, process_approval
+
+
+class FinanceVerificationInsightsQueryTests(TestCase):
+    """The insights endpoint must cost the same number of queries however much history exists"""
+
+    url = '/api/finance-verification/insights/'
+
+    def setUp(self):
+        cache.clear()
+        self.finance = Employee.objects.create_user(
+            'FV1', 'fv@example.com', 'Finance User', role='Finance Verification'
+        )
+        self.employee = Employee.objects.create_user(
+            'E1', 'e1@example.com', 'Employee One', report_to='FV1'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.finance)
+
+    def _add_requests(self, count):
+        for i in range(count):
+            reimbursement = Reimbursement.objects.create(
+                employee=self.employee, amount=Decimal('100.00'), date=date.today(),
+                current_approver_id='FV1', status='Pending',
+            )
+            advance = AdvanceRequest.objects.create(
+                employee=self.employee, amount=Decimal('50.50'), request_date=date.today(),
+                project_date=date.today(), current_approver_id='HR1', status='Pending',
+            )
+            rollups.record(reimbursement)
+            rollups.record(advance)
+            ApprovalHistory.objects.create(
+                request_type='advance', request_id=advance.id, approver_id='FV1',
+                approver_name='Finance User', action='approved',
+            )
+            if i % 2:
+                ApprovalHistory.objects.create(
+                    request_type='reimbursement', request_id=reimbursement.id, approver_id='FV1',
+                    approver_name='Finance User', action='rejected',
+                )
+
+    def _get(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_query_count_does_not_grow_with_history(self):
+        self._add_requests(2)
+        data, small_queries = self._get()
+
+        self._add_requests(30)
+        data, large_queries = self._get()
+
+        self.assertEqual(small_queries, large_queries)
+        self.assertLessEqual(large_queries, 5)
+
+        self.assertEqual(data['total_pending'], 32)
+        self.assertEqual(data['reimbursement_count'], 32)
+        self.assertEqual(data['advance_count'], 0)
+        self.assertEqual(data['total_amount'], 3200.0)
+        self.assertEqual(data['monthly_pending'], 32)
+        self.assertEqual(data['monthly_amount'], 3200.0)
+        self.assertEqual(data['total_verified'], 32)
+        self.assertEqual(data['advance_verified'], 32)
+        self.assertEqual(data['reimbursement_verified'], 0)
+        self.assertEqual(data['monthly_verified'], 32)
+        self.assertEqual(data['verified_amount'], 1616.0)
+        self.assertEqual(data['monthly_verified_amount'], 1616.0)
+        self.assertEqual(data['success_rate'], round(32 / 48 * 100, 1))
+
+    def test_verified_amount_skips_deleted_requests(self):
+        self._add_requests(2)
+        AdvanceRequest.objects.order_by('id').first().delete()
+
+        data, _ = self._get()
+
+        self.assertEqual(data['total_verified'], 2)
+        self.assertEqual(data['verified_amount'], 50.5)
+
+
+class EndpointQueryBudgetTests(TestCase):
+    """
+    Calls every URL in Xpensure/urls.py as the role that uses it, on a small
+    and a larger dataset, and fails if any endpoint's query count grows with
+    the number of rows - i.e. an N+1 slipped into views.py. A new URL must
+    get an entry in `endpoints()` (test_every_url_is_covered enforces it).
+    """
+
+    maxDiff = None
+
+    # Requests per scenario (and extra history rows per request) seeded per round
+    SMALL = 2
+    LARGE = 6
+
+    # Endpoints whose POST body is JSON (nested lists) rather than a form
+    JSON_BODIES = {'request-batch-details', 'bulk-approval', 'payment-run'}
+
+    SCENARIOS = (
+        # status, current approver, approved_by_finance, approved_by_hr, approved_by_ceo
+        ('Pending', 'M1', False, False, False),
+        ('Pending', 'FV1', False, False, False),
+        ('Pending', 'HR1', True, False, False),
+        ('Pending', 'CEO1', True, True, False),
+        ('Approved', 'FP1', True, True, True),
+        ('Paid', None, True, True, True),
+        ('Rejected', 'E1', False, False, False),
+    )
+
+    def setUp(self):
+        cache.clear()
+        create = Employee.objects.create_user
+        self.users = {
+            'ceo': create('CEO1', 'ceo@example.com', 'Chief', password='pw', role='CEO', department='Exec'),
+            'fv': create('FV1', 'fv@example.com', 'Verifier', password='pw', role='Finance Verification',
+                         department='Finance'),
+            'fp': create('FP1', 'fp@example.com', 'Payer', password='pw', role='Finance Payment', department='Finance'),
+            'hr': create('HR1', 'hr@example.com', 'People', password='pw', role='HR', department='HR'),
+            'mgr': create('M1', 'm1@example.com', 'Manager', password='pw', department='Eng'),
+            'emp': create('E1', 'e1@example.com', 'Employee', password='pw', department='Eng', report_to='M1'),
+            'admin': create('ADMIN', 'admin@example.com', 'Admin', password='pw', is_staff=True),
+        }
+        Employee.objects.filter(employee_id__in=['E1', 'CEO1']).update(avatar='avatars/me.png')
+        self.extra = 0
+
+    def _seed(self, rounds):
+        today = date.today()
+        for _ in range(rounds):
+            self.extra += 1
+            Employee.objects.create_user(
+                f'X{self.extra}', f'x{self.extra}@example.com', f'Extra {self.extra}',
+                department='Sales', report_to='M1', avatar='avatars/x.png',
+                phone_number='9000000000', aadhar_card='100000000000',
+            )
+            for request_status, approver, by_finance, by_hr, by_ceo in self.SCENARIOS:
+                common = dict(
+                    employee_id='E1', amount=Decimal('120.00'), status=request_status,
+                    current_approver_id=approver, approved_by_finance=by_finance, approved_by_ceo=by_ceo,
+                    project_id='P1', attachments=['reimbursements/receipt.pdf'], payments=[{'amount': 1}],
+                    payment_date=timezone.now() if request_status == 'Paid' else None,
+                    final_approver='CEO1' if by_ceo else None,
+                )
+                created = [
+                    ('reimbursement', Reimbursement.objects.create(date=today, description='r', **common)),
+                    ('advance', AdvanceRequest.objects.create(
+                        request_date=today, project_date=today, description='a', project_name='Alpha',
+                        approved_by_hr=by_hr, **common
+                    )),
+                ]
+                for request_type, obj in created:
+                    ApprovalHistory.objects.create(
+                        request_type=request_type, request_id=obj.id, approver_id='E1',
+                        approver_name='Employee', action='submitted',
+                    )
+                    ApprovalHistory.objects.create(
+                        request_type=request_type, request_id=obj.id, approver_id='M1',
+                        approver_name='Manager', action='approved',
+                    )
+                    ApprovalHistory.objects.create(
+                        request_type=request_type, request_id=obj.id, approver_id='FV1', approver_name='Verifier',
+                        action='rejected' if request_status == 'Rejected' else 'approved',
+                    )
+
+        # Every request's history grows too, so per-history-row lookups show up
+        for request_type, model in (('reimbursement', Reimbursement), ('advance', AdvanceRequest)):
+            for request_id in model.objects.values_list('id', flat=True):
+                ApprovalHistory.objects.create(
+                    request_type=request_type, request_id=request_id, approver_id='HR1',
+                    approver_name='People', action='forwarded',
+                )
+
+        rollups.rebuild()
+        rollups.rebuild_queue_stats()
+
+    def _target(self, model, **filters):
+        return model.objects.filter(**filters).order_by('id').values_list('id', flat=True).first()
+
+    def _paid_run(self):
+        """A PaymentRun holding every Paid request"""
+        run = PaymentRun.objects.create(paid_at=timezone.now())
+        for model in (Reimbursement, AdvanceRequest):
+            model.objects.filter(status='Paid').update(payment_run=run)
+        return run.id
+
+    def endpoints(self):
+        """(url name, role, method, url kwargs, query params / body) - callables are resolved per call"""
+        pending = lambda model, approver: (lambda: {'request_id': self._target(
+            model, current_approver_id=approver, status='Pending')})
+        own = lambda model: (lambda: {'pk': self._target(model, employee_id='E1', status='Pending')})
+        body = lambda model, approver, request_type, **extra: (lambda: dict(
+            request_id=self._target(model, current_approver_id=approver, status='Pending'),
+            request_type=request_type, **extra,
+        ))
+        report = {'employee_id': 'E1', 'project_identifier': 'P1', 'period': 'all_time'}
+        bulk = lambda: {'items': [
+            {'request_type': request_type, 'id': request_id, 'action': action, 'reason': 'no'}
+            for request_type, model, action in (
+                ('reimbursement', Reimbursement, 'approve'), ('advance', AdvanceRequest, 'reject'),
+            )
+            for request_id in model.objects.filter(current_approver_id='FV1', status='Pending')
+            .order_by('id').values_list('id', flat=True)[:40]
+        ]}
+        payable = lambda: {'requests': [
+            {'request_type': request_type, 'id': request_id}
+            for request_type, model in (('reimbursement', Reimbursement), ('advance', AdvanceRequest))
+            for request_id in model.objects.filter(current_approver_id='FP1', status='Approved')
+            .order_by('id').values_list('id', flat=True)[:40]
+        ]}
+        batch = lambda: {'requests': [
+            {'request_type': request_type, 'id': request_id}
+            for request_type, model in (('reimbursement', Reimbursement), ('advance', AdvanceRequest))
+            for request_id in model.objects.order_by('id').values_list('id', flat=True)[:40]
+        ]}
+
+        return [
+            ('reimbursement-list', 'emp', 'get', {}, None),
+            ('reimbursement-list', 'emp', 'post', {}, {
+                'amount': '10.00', 'date': date.today().isoformat(), 'description': 'x', 'project_id': 'P1'}),
+            ('reimbursement-detail', 'emp', 'get', own(Reimbursement), None),
+            ('reimbursement-detail', 'emp', 'patch', own(Reimbursement), {'description': 'changed'}),
+            ('reimbursement-detail', 'emp', 'delete', own(Reimbursement), None),
+            ('advance-list', 'emp', 'get', {}, None),
+            ('advance-list', 'emp', 'post', {}, {
+                'amount': '10.00', 'request_date': date.today().isoformat(),
+                'project_date': date.today().isoformat(), 'description': 'x', 'project_id': 'P1',
+                'project_name': 'Alpha'}),
+            ('advance-detail', 'emp', 'get', own(AdvanceRequest), None),
+            ('advance-detail', 'emp', 'patch', own(AdvanceRequest), {'description': 'changed'}),
+            ('advance-detail', 'emp', 'delete', own(AdvanceRequest), None),
+            ('reimbursement-list-create', 'emp', 'get', {}, None),
+            ('advance-list-create', 'emp', 'get', {}, None),
+            ('employee-list', 'admin', 'get', {}, None),
+            ('employee-detail', 'admin', 'get', {'employee_id': 'E1'}, None),
+            ('employee-delete', 'admin', 'delete', {'employee_id': 'X1'}, None),
+            ('employee-signup', None, 'post', {}, {
+                'employee_id': 'X1', 'email': 'x1@example.com', 'fullName': 'Extra 1', 'department': 'Sales',
+                'phone_number': '9000000000', 'aadhar_card': '100000000000',
+                'password': 'pw12345', 'confirm_password': 'pw12345'}),
+            ('employee-login', None, 'post', {}, {'employee_id': 'E1', 'password': 'pw'}),
+            ('employee-profile', 'emp', 'get', {'employee_id': 'E1'}, None),
+            ('employee-profile', 'emp', 'put', {'employee_id': 'E1'}, {'phone_number': '123'}),
+            ('employee-csv-download', 'emp', 'get', {}, {'period': '1 Month'}),
+            ('employee-verify-password', 'emp', 'post', {'employee_id': 'E1'}, {'old_password': 'pw'}),
+            ('employee-change-password', 'emp', 'put', {'employee_id': 'E1'}, {'new_password': 'pw12345'}),
+            ('pending-approvals', 'emp', 'get', {}, None),
+            ('pending-approvals', 'mgr', 'get', {}, None),
+            ('pending-approvals', 'mgr', 'get', {}, {'limit': 3}),
+            ('request-sync', 'mgr', 'get', {}, None),
+            ('approve-request', 'mgr', 'post', pending(Reimbursement, 'M1'), {'request_type': 'reimbursement'}),
+            ('reject-request', 'mgr', 'post', pending(AdvanceRequest, 'M1'),
+             {'request_type': 'advance', 'rejection_reason': 'no'}),
+            ('approver-csv-download', 'mgr', 'get', {}, {'period': '1 Month'}),
+            ('ceo-dashboard', 'ceo', 'get', {}, None),
+            ('ceo-analytics', 'ceo', 'get', {}, None),
+            ('spend-time-series', 'ceo', 'get', {}, None),
+            ('approval-latency', 'ceo', 'get', {}, None),
+            ('ceo-history', 'ceo', 'get', {}, None),
+            ('ceo-approve-request', 'ceo', 'post', {}, body(Reimbursement, 'CEO1', 'reimbursement')),
+            ('ceo-reject-request', 'ceo', 'post', {}, body(AdvanceRequest, 'CEO1', 'advance', reason='no')),
+            ('ceo-request-details', 'ceo', 'get', pending(Reimbursement, 'CEO1'), {'request_type': 'reimbursement'}),
+            ('ceo-generate-report', 'ceo', 'get', {}, {'report_type': 'monthly', 'months': 1}),
+            ('ceo-employee-project-report', 'ceo', 'post', {}, report),
+            ('ceo-csv-report', 'ceo', 'post', {}, {'report_type': 'employee', 'identifier': 'E1',
+                                                   'period': '1_month'}),
+            ('approval-timeline', 'emp', 'get', pending(Reimbursement, 'CEO1'), {'request_type': 'reimbursement'}),
+            ('request-batch-details', 'mgr', 'post', {}, batch),
+            ('bulk-approval', 'fv', 'post', {}, bulk),
+            ('finance-verification-dashboard', 'fv', 'get', {}, None),
+            ('finance-verification-approve', 'fv', 'post', {}, body(Reimbursement, 'FV1', 'reimbursement')),
+            ('finance-verification-reject', 'fv', 'post', {}, body(AdvanceRequest, 'FV1', 'advance', reason='no')),
+            ('finance-verification-insights', 'fv', 'get', {}, None),
+            ('finance-verification-history', 'fv', 'get', {}, None),
+            ('finance-verification-employee-project-report', 'fv', 'get', {}, report),
+            ('finance-verification-csv-report', 'fv', 'get', {}, {'report_type': 'all', 'period': '1_month'}),
+            ('finance-payment-dashboard', 'fp', 'get', {}, None),
+            ('finance-payment-mark-paid', 'fp', 'post', {}, lambda: {
+                'request_id': self._target(Reimbursement, current_approver_id='FP1', status='Approved'),
+                'request_type': 'reimbursement'}),
+            ('payment-run', 'fp', 'post', {}, payable),
+            ('payment-run-csv', 'fp', 'get', lambda: {'run_id': self._paid_run()}, None),
+            ('finance-payment-insights', 'fp', 'get', {}, None),
+            ('employee-project-spending', 'fp', 'get', {}, report),
+            ('hr-pending-approvals', 'hr', 'get', {}, None),
+            ('hr-approve-request', 'hr', 'post', pending(AdvanceRequest, 'HR1'), None),
+            ('hr-reject-request', 'hr', 'post', pending(AdvanceRequest, 'HR1'), {'rejection_reason': 'no'}),
+            ('request-details', 'hr', 'get', pending(AdvanceRequest, 'HR1'), None),
+            ('health', None, 'get', {}, None),
+        ]
+
+    def _call(self, url_name, role, method, url_kwargs, data):
+        url_kwargs = url_kwargs() if callable(url_kwargs) else url_kwargs
+        data = data() if callable(data) else data
+
+        client = APIClient()
+        if role:
+            client.force_authenticate(self.users[role])
+        cache.clear()
+
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                if method == 'get':
+                    response = client.get(reverse(url_name, kwargs=url_kwargs), data)
+                else:
+                    response = getattr(client, method)(
+                        reverse(url_name, kwargs=url_kwargs), data or {},
+                        format='json' if url_name in self.JSON_BODIES else 'multipart',
+                    )
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            # Leave the dataset as it was for the next endpoint
+            transaction.set_rollback(True)
+
+        self.assertLess(response.status_code, 400, f'{method.upper()} {url_name} as {role}: {response.status_code}')
+        return len(queries)
+
+    def _measure(self):
+        return {
+            f'{method.upper()} {url_name} as {role} {data if not callable(data) else ""}': self._call(
+                url_name, role, method, url_kwargs, data)
+            for url_name, role, method, url_kwargs, data in self.endpoints()
+        }
+
+    def test_query_count_is_constant_in_dataset_size(self):
+        self._seed(self.SMALL)
+        small = self._measure()
+        self._seed(self.LARGE)
+        large = self._measure()
+
+        growing = {label: (small[label], large[label]) for label in small if small[label] != large[label]}
+        self.assertEqual(growing, {}, 'query count grows with rows - {label: (small, large)}')
+
+    def test_every_url_is_covered(self):
+        from .urls import api_patterns, router
+
+        names = {pattern.name for pattern in api_patterns if getattr(pattern, 'name', None)}
+        names |= {pattern.name for pattern in router.urls if pattern.name and pattern.name != 'api-root'}
+        covered = {url_name for url_name, *_ in self.endpoints()}
+        self.assertEqual(names - covered, set())
+
+
+class SparseFieldsetTests(TestCase):
+    """?fields= / ?exclude= trim the row dicts and the columns selected for them"""
+
+    def setUp(self):
+        cache.clear()
+        self.manager = Employee.objects.create_user('M1', 'm1@example.com', 'Manager')
+        self.employee = Employee.objects.create_user('E1', 'e1@example.com', 'Employee One', report_to='M1')
+        Reimbursement.objects.create(
+            employee=self.employee, amount=Decimal('100.00'), date=date.today(), description='Taxi',
+            current_approver_id='M1', status='Pending', payments=[{'amount': 100}], attachments=['r/a.png'],
+        )
+        AdvanceRequest.objects.create(
+            employee=self.employee, amount=Decimal('50.50'), request_date=date.today(), project_date=date.today(),
+            project_name='Alpha', current_approver_id='M1', status='Pending',
+        )
+        self.client = APIClient()
+
+    def _get(self, user, url):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        return response, [query['sql'] for query in ctx.captured_queries]
+
+    def test_fields_restrict_rows_and_columns(self):
+        response, queries = self._get(self.manager, '/api/approvals/pending/?fields=id,amount,status')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [set(row) for row in response.data['reimbursements_to_approve'] + response.data['advances_to_approve']],
+            [{'id', 'amount', 'status'}] * 2,
+        )
+        union = next(sql for sql in queries if 'UNION' in sql)
+        self.assertNotIn('"payments"', union)
+        self.assertNotIn('"attachments"', union)
+
+    def test_exclude_drops_keys(self):
+        response, _ = self._get(self.manager, '/api/approvals/pending/?exclude=payments,attachments,projectId')
+
+        row = response.data['reimbursements_to_approve'][0]
+        self.assertNotIn('payments', row)
+        self.assertNotIn('projectId', row)
+        self.assertEqual(row['project_id'], None)
+        self.assertEqual(row['employee_name'], 'Employee One')
+
+    def test_unknown_field_is_rejected(self):
+        response, _ = self._get(self.manager, '/api/approvals/pending/?fields=id,nope')
+        self.assertEqual(response.status_code, 400)
+
+        response, _ = self._get(self.employee, '/api/reimbursements/?fields=nope')
+        self.assertEqual(response.status_code, 400)
+
+    def test_drf_list_fields(self):
+        response, queries = self._get(self.employee, '/api/advances/?fields=id,projectName')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [{'id': AdvanceRequest.objects.get().id, 'projectName': 'Alpha'}])
+        self.assertNotIn('"description"', queries[-1])
+
+
+class NormalisedPayloadTests(TestCase):
+    """?normalize=employees moves employee names/avatars out of the rows into one `employees` map"""
+
+    def setUp(self):
+        cache.clear()
+        self.manager = Employee.objects.create_user('M1', 'm1@example.com', 'Manager')
+        for employee_id, name in (('E1', 'Employee One'), ('E2', 'Employee Two')):
+            employee = Employee.objects.create_user(employee_id, f'{employee_id}@example.com', name, report_to='M1')
+            employee.avatar = f'avatars/{employee_id}.png'
+            employee.save()
+            for _ in range(2):
+                Reimbursement.objects.create(
+                    employee=employee, amount=Decimal('10.00'), date=date.today(), description='Taxi',
+                    current_approver_id='M1', status='Pending',
+                )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def test_rows_reference_side_loaded_employees(self):
+        plain = self.client.get('/api/approvals/pending/').data
+        with CaptureQueriesContext(connection) as queries:
+            normalised = self.client.get('/api/approvals/pending/?normalize=employees').data
+
+        self.assertEqual(set(normalised['employees']), {'E1', 'E2'})
+        self.assertEqual(normalised['employees']['E1']['employee_name'], 'Employee One')
+        self.assertTrue(normalised['employees']['E1']['employee_avatar'].endswith('/media/avatars/E1.png'))
+        rebuilt = [
+            {**row, **normalised['employees'][row['employee_id']]}
+            for row in normalised['reimbursements_to_approve']
+        ]
+        self.assertEqual(rebuilt, plain['reimbursements_to_approve'])
+        union = next(query['sql'] for query in queries.captured_queries if 'UNION' in query['sql'])
+        self.assertNotIn('"Xpensure_employee"', union)
+
+    def test_respects_sparse_fields(self):
+        data = self.client.get('/api/approvals/pending/?normalize=employees&fields=id,employee_name').data
+        self.assertEqual(set(data['reimbursements_to_approve'][0]), {'id', 'employee_id'})
+        self.assertEqual(data['employees']['E2'], {'employee_name': 'Employee Two'})
+
+
+class RequestBatchDetailsTests(TestCase):
+    """POST /api/requests/batch-details/ returns what the single detail/timeline endpoints do"""
+
+    def setUp(self):
+        self.ceo = Employee.objects.create_user('CEO1', 'ceo@example.com', 'Chief', role='CEO')
+        self.manager = Employee.objects.create_user('M1', 'm1@example.com', 'Manager')
+        self.employee = Employee.objects.create_user('E1', 'e1@example.com', 'Employee One', report_to='M1')
+        self.other = Employee.objects.create_user('E2', 'e2@example.com', 'Employee Two')
+        self.reimbursement = Reimbursement.objects.create(
+            employee=self.employee, amount=Decimal('100.00'), date=date.today(), description='Taxi',
+            current_approver_id='CEO1', status='Pending',
+        )
+        ApprovalHistory.objects.create(
+            request_type='reimbursement', request_id=self.reimbursement.id, approver_id='M1',
+            approver_name='Manager', action='approved',
+        )
+        self.advance = AdvanceRequest.objects.create(
+            employee=self.other, amount=Decimal('50.50'), request_date=date.today(), project_date=date.today(),
+            project_name='Alpha', current_approver_id='CEO1', status='Pending',
+        )
+        self.client = APIClient()
+
+    def _batch(self, user, requests):
+        self.client.force_authenticate(user)
+        return self.client.post('/api/requests/batch-details/', {'requests': requests}, format='json')
+
+    def test_matches_single_endpoints(self):
+        response = self._batch(self.ceo, [
+            {'request_type': 'reimbursement', 'id': self.reimbursement.id},
+            {'request_type': 'advance', 'id': self.advance.id},
+            {'request_type': 'advance', 'id': self.advance.id},
+            {'request_type': 'advance', 'id': 999},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(r['request_type'], r['id']) for r in response.data['results']],
+                         [('reimbursement', self.reimbursement.id), ('advance', self.advance.id)])
+        self.assertEqual(response.data['not_found'], [{'request_type': 'advance', 'id': 999}])
+
+        for result in response.data['results']:
+            query = f"?request_type={result['request_type']}"
+            details = self.client.get(f"/api/ceo/request-details/{result['id']}/{query}")
+            timeline = self.client.get(f"/api/approval-timeline/{result['id']}/{query}")
+            self.assertEqual(result['details'], details.data)
+            self.assertEqual({key: result[key] for key in timeline.data}, timeline.data)
+
+    def test_only_visible_requests(self):
+        requests = [
+            {'request_type': 'reimbursement', 'id': self.reimbursement.id},
+            {'request_type': 'advance', 'id': self.advance.id},
+        ]
+        for user in (self.employee, self.manager):
+            response = self._batch(user, requests)
+            self.assertEqual([r['id'] for r in response.data['results']], [self.reimbursement.id])
+            self.assertEqual(response.data['not_found'], [{'request_type': 'advance', 'id': self.advance.id}])
+
+    def test_hr_sees_only_requests_on_its_route(self):
+        hr = Employee.objects.create_user('HR1', 'hr@example.com', 'People', role='HR')
+        AdvanceRequest.objects.filter(pk=self.advance.pk).update(approval_route=['HR1', 'CEO1'])
+        response = self._batch(hr, [
+            {'request_type': 'reimbursement', 'id': self.reimbursement.id},
+            {'request_type': 'advance', 'id': self.advance.id},
+        ])
+        self.assertEqual([r['id'] for r in response.data['results']], [self.advance.id])
+        self.assertEqual(response.data['not_found'], [{'request_type': 'reimbursement', 'id': self.reimbursement.id}])
+
+    def test_invalid_input(self):
+        for requests in ([], [{'request_type': 'other', 'id': 1}], [{'request_type': 'advance', 'id': 'x'}],
+                         [{'request_type': 'advance', 'id': n} for n in range(101)]):
+            self.assertEqual(self._batch(self.ceo, requests).status_code, 400)
+
+
+class EmployeeDirectoryTests(TestCase):
+    """People are loaded in batches and remembered per request (and per process with a TTL)"""
+
+    def setUp(self):
+        cache.clear()
+        self.ceo = Employee.objects.create_user('CEO1', 'ceo@example.com', 'Chief', role='CEO')
+        self.employee = Employee.objects.create_user('E1', 'e1@example.com', 'Employee One', report_to='CEO1')
+
+    def test_batch_load_is_remembered(self):
+        people = EmployeeDirectory()
+        with CaptureQueriesContext(connection) as queries:
+            found = people.load(['CEO1', 'E1', 'NOPE'])
+            self.assertEqual(people.get('E1').fullName, 'Employee One')
+            self.assertIsNone(people.get('NOPE'))
+            self.assertEqual(people.first_with_role('CEO').employee_id, 'CEO1')
+            self.assertEqual(people.with_role('CEO'), [people.get('CEO1')])
+        self.assertEqual(set(found), {'CEO1', 'E1'})
+        self.assertEqual(len(queries), 2)  # the batch + the role
+
+    @override_settings(EMPLOYEE_DIRECTORY_TTL=60)
+    def test_process_layer_until_data_changes(self):
+        EmployeeDirectory().load(['E1'])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(EmployeeDirectory().get('E1').report_to, 'CEO1')
+        self.assertEqual(len(queries), 1)  # the data version only
+
+        Employee.objects.filter(employee_id='E1').update(fullName='Renamed')
+        bump_data_version()
+        self.assertEqual(EmployeeDirectory().get('E1').fullName, 'Renamed')
+
+    @override_settings(EMPLOYEE_DIRECTORY_TTL=60)
+    def test_delete_drops_shared_entry(self):
+        self.assertIsNotNone(EmployeeDirectory().get('E1'))
+        client = APIClient()
+        client.force_authenticate(self.ceo)
+        self.assertEqual(client.delete('/api/employees/E1/delete/').status_code, 204)
+        self.assertIsNone(EmployeeDirectory().get('E1'))
+
+
+class OrgChartRoutingTests(TestCase):
+    """get_next_approver routes from the in-memory org chart, which follows Employee edits"""
+
+    def setUp(self):
+        cache.clear()
+        create = Employee.objects.create_user
+        self.fv = create('FV1', 'fv@example.com', 'Verifier', role='Finance Verification')
+        self.ceo = create('CEO1', 'ceo@example.com', 'Chief', role='CEO')
+        self.hr = create('HR1', 'hr@example.com', 'People', role='HR')
+        self.manager = create('M1', 'm1@example.com', 'Manager')
+        self.employee = create('E1', 'e1@example.com', 'Employee One', report_to='M1')
+
+    def test_routing_needs_no_queries(self):
+        get_next_approver(self.employee)  # builds the index
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_next_approver(self.employee), 'M1')
+            self.assertEqual(get_next_approver(self.manager), 'FV1')
+            self.assertEqual(get_next_approver(self.fv, 'reimbursement'), 'CEO1')
+            self.assertEqual(get_next_approver(self.fv, 'advance'), 'HR1')
+            self.assertEqual(get_next_approver(self.hr, 'advance'), 'CEO1')
+            self.assertIsNone(get_next_approver(self.ceo))
+        self.assertEqual(len(queries), 0)
+
+    def test_employee_changes_invalidate_the_index(self):
+        self.assertIsNone(get_next_approver(self.ceo))
+        self.assertEqual(get_next_approver(self.employee), 'M1')
+
+        payment = Employee.objects.create_user('FP1', 'fp@example.com', 'Payer', role='Finance Payment')
+        self.assertEqual(get_next_approver(self.ceo), 'FP1')
+
+        self.manager.delete()
+        self.assertEqual(get_next_approver(self.employee), 'FV1')
+
+        version = org_chart_version()
+        payment.save(update_fields=['last_login'])
+        self.assertEqual(org_chart_version(), version)
+
+    def test_index_expires_without_a_version_bump(self):
+        self.assertIsNone(get_next_approver(self.ceo))
+
+        # Like an edit made through another worker whose cache bump this process never sees
+        Employee.objects.bulk_create([Employee(employee_id='FP1', email='fp@example.com', role='Finance Payment')])
+        self.assertIsNone(get_next_approver(self.ceo))
+        with override_settings(ORG_CHART_TTL=0):
+            self.assertEqual(get_next_approver(self.ceo), 'FP1')
+
+
+class ApprovalRouteTests(TestCase):
+    """The whole route is resolved at submission; approvals step through it"""
+
+    def setUp(self):
+        cache.clear()
+        create = Employee.objects.create_user
+        self.users = {
+            'fv': create('FV1', 'fv@example.com', 'Verifier', role='Finance Verification'),
+            'ceo': create('CEO1', 'ceo@example.com', 'Chief', role='CEO'),
+            'fp': create('FP1', 'fp@example.com', 'Payer', role='Finance Payment'),
+            'mgr': create('M1', 'm1@example.com', 'Manager'),
+            'emp': create('E1', 'e1@example.com', 'Employee One', report_to='M1'),
+        }
+        self.client = APIClient()
+        self.client.force_authenticate(self.users['emp'])
+        response = self.client.post('/api/reimbursements/', {
+            'amount': '25.00', 'date': date.today().isoformat(), 'description': 'Taxi',
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.request = Reimbursement.objects.get()
+
+    def test_route_is_stored_and_advanced(self):
+        self.assertEqual(self.request.approval_route, ['M1', 'FV1', 'CEO1', 'FP1'])
+        self.assertEqual((self.request.currentStep, self.request.current_approver_id), (0, 'M1'))
+
+        for role, step, approver, request_status in (
+            ('mgr', 1, 'FV1', 'Pending'),
+            ('fv', 2, 'CEO1', 'Pending'),
+            ('ceo', 3, 'FP1', 'Approved'),
+            ('fp', 4, None, 'Paid'),
+        ):
+            process_approval(self.request, self.users[role])
+            self.request.refresh_from_db()
+            self.assertEqual(
+                (self.request.currentStep, self.request.current_approver_id, self.request.status),
+                (step, approver, request_status),
+            )
+
+    def test_route_is_kept_when_the_org_chart_changes(self):
+        Employee.objects.create_user('CEO0', 'ceo0@example.com', 'Other Chief', role='CEO')
+        self.users['fv'].report_to = 'CEO0'
+        self.users['fv'].save()
+
+        process_approval(self.request, self.users['mgr'])
+        process_approval(self.request, self.users['fv'])
+        self.assertEqual(self.request.current_approver_id, 'CEO1')
+
+    def test_timeline_shows_upcoming_steps(self):
+        response = self.client.get(f'/api/approval-timeline/{self.request.id}/?request_type=reimbursement')
+
+        steps = [(step['approver_id'], step['status']) for step in response.data['timeline']]
+        self.assertEqual(steps, [
+            ('E1', 'completed'), ('M1', 'pending'), ('FV1', 'upcoming'), ('CEO1', 'upcoming'), ('FP1', 'upcoming'),
+        ])
+        self.assertEqual(response.data['timeline'][-1]['step_type'], 'finance_payment')
+        self.assertEqual(response.data['current_step'], 2)
+
+
+class BulkApprovalTests(TestCase):
+    """POST /api/approvals/bulk/ applies many transitions at once and reports each item"""
+
+    def setUp(self):
+        cache.clear()
+        create = Employee.objects.create_user
+        self.fv = create('FV1', 'fv@example.com', 'Verifier', role='Finance Verification')
+        create('CEO1', 'ceo@example.com', 'Chief', role='CEO')
+        create('HR1', 'hr@example.com', 'People', role='HR')
+        employee = create('E1', 'e1@example.com', 'Employee One', department='Ops')
+        common = dict(employee=employee, amount=Decimal('10.00'), description='x', status='Pending',
+                      current_approver_id='FV1')
+        self.reimbursements = [
+            Reimbursement.objects.create(date=date.today(), **common) for _ in range(3)
+        ]
+        self.advance = AdvanceRequest.objects.create(
+            request_date=date.today(), project_date=date.today(), **common
+        )
+        self.elsewhere = Reimbursement.objects.create(date=date.today(), **dict(common, current_approver_id='CEO1'))
+        rollups.rebuild()
+        rollups.rebuild_queue_stats()
+        self.client = APIClient()
+        self.client.force_authenticate(self.fv)
+
+    def _bulk(self, items):
+        return self.client.post('/api/approvals/bulk/', {'items': items}, format='json')
+
+    def test_mixed_batch(self):
+        first, second, third = self.reimbursements
+        response = self._bulk([
+            {'request_type': 'reimbursement', 'id': first.id, 'action': 'approve'},
+            {'request_type': 'reimbursement', 'id': second.id, 'action': 'approve'},
+            {'request_type': 'advance', 'id': self.advance.id, 'action': 'reject', 'reason': 'Missing bill'},
+            {'request_type': 'reimbursement', 'id': third.id, 'action': 'reject'},
+            {'request_type': 'reimbursement', 'id': self.elsewhere.id, 'action': 'approve'},
+            {'request_type': 'reimbursement', 'id': first.id, 'action': 'approve'},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['approved'], response.data['rejected'], response.data['failed']), (2, 1, 3))
+        self.assertEqual([result['ok'] for result in response.data['results']],
+                         [True, True, True, False, False, False])
+        self.assertEqual(response.data['results'][0]['current_approver_id'], 'CEO1')
+
+        first.refresh_from_db()
+        self.advance.refresh_from_db()
+        third.refresh_from_db()
+        self.assertEqual((first.status, first.current_approver_id, first.approved_by_finance),
+                         ('Pending', 'CEO1', True))
+        # Finance Verification rejections close the request, as on /api/finance-verification/reject/
+        self.assertEqual((self.advance.status, self.advance.current_approver_id), ('Rejected', None))
+        self.assertEqual((third.status, third.current_approver_id), ('Pending', 'FV1'))
+        self.assertEqual(ApprovalHistory.objects.filter(action='approved').count(), 2)
+        self.assertEqual(ApprovalHistory.objects.filter(action__in=['rejected', 'notification']).count(), 1)
+
+        # The incrementally maintained read models match a rebuild
+        kept = sorted(ApproverQueueStats.objects.filter(pending_count__gt=0).values_list(
+            'approver_id', 'request_type', 'status', 'pending_count', 'pending_amount'))
+        rollups.rebuild_queue_stats()
+        self.assertEqual(kept, sorted(ApproverQueueStats.objects.filter(pending_count__gt=0).values_list(
+            'approver_id', 'request_type', 'status', 'pending_count', 'pending_amount')))
+        self.assertEqual(SyncTombstone.objects.filter(employee_id='FV1').count(), 3)
+
+    def test_role_checks_match_single_item_endpoints(self):
+        ceo = Employee.objects.get(employee_id='CEO1')
+        AdvanceRequest.objects.filter(pk=self.advance.pk).update(current_approver_id='CEO1', approved_by_finance=True)
+        self.client.force_authenticate(ceo)
+        item = {'request_type': 'advance', 'id': self.advance.id, 'action': 'approve'}
+
+        single = self.client.post('/api/ceo/approve-request/', {'request_id': self.advance.id, 'request_type': 'advance'})
+        self.assertEqual(single.status_code, 400)
+        response = self._bulk([item])
+        self.assertEqual(response.data['failed'], 1)
+        self.assertEqual(response.data['results'][0]['error'], single.data['error'])
+        self.advance.refresh_from_db()
+        self.assertEqual((self.advance.status, self.advance.current_approver_id), ('Pending', 'CEO1'))
+
+        AdvanceRequest.objects.filter(pk=self.advance.pk).update(approved_by_hr=True)
+        self.assertEqual(self._bulk([item]).data['approved'], 1)
+
+    def test_invalid_payload(self):
+        self.assertEqual(self._bulk([]).status_code, 400)
+        self.assertEqual(self._bulk([{'request_type': 'advance', 'id': n, 'action': 'approve'}
+                                     for n in range(101)]).status_code, 400)
+        response = self._bulk([{'request_type': 'advance', 'id': 'x', 'action': 'approve'}, 'nope'])
+        self.assertEqual(response.data['failed'], 2)
+
+
+class TransitionConflictTests(TestCase):
+    """A transition applied to a stale copy of a request is refused instead of applied twice"""
+
+    def setUp(self):
+        cache.clear()
+        create = Employee.objects.create_user
+        self.fv = create('FV1', 'fv@example.com', 'Verifier', role='Finance Verification')
+        create('CEO1', 'ceo@example.com', 'Chief', role='CEO')
+        employee = create('E1', 'e1@example.com', 'Employee One', department='Ops')
+        self.reimbursement = Reimbursement.objects.create(
+            employee=employee, amount=Decimal('10.00'), description='x', date=date.today(),
+            status='Pending', current_approver_id='FV1',
+        )
+
+    def test_second_writer_loses(self):
+        first = Reimbursement.objects.get(pk=self.reimbursement.pk)
+        stale = Reimbursement.objects.get(pk=self.reimbursement.pk)
+
+        process_approval(first, self.fv, approved=True)
+        with self.assertRaises(TransitionConflict):
+            process_approval(stale, self.fv, approved=False, rejection_reason='late')
+
+        self.reimbursement.refresh_from_db()
+        self.assertEqual((self.reimbursement.status, self.reimbursement.current_approver_id), ('Pending', 'CEO1'))
+        self.assertEqual(ApprovalHistory.objects.count(), 1)
+
+    def test_bulk_skips_moved_request(self):
+        stale = Reimbursement.objects.get(pk=self.reimbursement.pk)
+        process_approval(Reimbursement.objects.get(pk=self.reimbursement.pk), self.fv, approved=True)
+        with self.assertRaises(TransitionConflict) as caught:
+            process_approval(stale, self.fv, approved=True)
+        self.assertEqual(caught.exception.status_code, 409)
+
+        # The bulk path re-reads its rows under a lock: a request that moved on just fails
+        client = APIClient()
+        client.force_authenticate(self.fv)
+        response = client.post('/api/approvals/bulk/', {'items': [
+            {'request_type': 'reimbursement', 'id': self.reimbursement.id, 'action': 'approve'},
+        ]}, format='json')
+        self.assertEqual(response.data['failed'], 1)
+        self.assertEqual(ApprovalHistory.objects.count(), 1)
+
+    def test_finance_verification_reject_is_checked(self):
+        stale = Reimbursement.objects.get(pk=self.reimbursement.pk)
+        client = APIClient()
+        client.force_authenticate(self.fv)
+        response = client.post('/api/finance-verification/reject/', {
+            'request_id': self.reimbursement.id, 'request_type': 'reimbursement', 'reason': 'No bill'})
+        self.assertEqual(response.status_code, 200)
+
+        self.reimbursement.refresh_from_db()
+        self.assertEqual((self.reimbursement.status, self.reimbursement.current_approver_id), ('Rejected', None))
+        self.assertEqual(list(ApprovalHistory.objects.values_list('action', 'comments')), [('rejected', 'No bill')])
+        with self.assertRaises(TransitionConflict):
+            process_approval(stale, self.fv, approved=True)
+        self.assertEqual(ApprovalHistory.objects.count(), 1)
+
+    def test_generic_reject_sends_back_to_employee(self):
+        # Only the Finance Verification reject endpoint (and bulk) close the request
+        client = APIClient()
+        client.force_authenticate(self.fv)
+        response = client.post(f'/api/approvals/{self.reimbursement.id}/reject/', {
+            'request_type': 'reimbursement', 'rejection_reason': 'No bill'})
+        self.assertEqual(response.status_code, 200)
+
+        self.reimbursement.refresh_from_db()
+        self.assertEqual((self.reimbursement.status, self.reimbursement.current_approver_id), ('Rejected', 'E1'))
+        self.assertEqual(list(ApprovalHistory.objects.values_list('action', flat=True)), ['rejected', 'notification'])
+
+
+class PaymentRunTests(TestCase):
+    """POST /api/finance-payment/payment-runs/ pays a batch; its CSV lists it with per-employee totals"""
+
+    def setUp(self):
+        cache.clear()
+        create = Employee.objects.create_user
+        self.fp = create('FP1', 'fp@example.com', 'Payer', role='Finance Payment')
+        first = create('E1', 'e1@example.com', 'Employee One', department='Ops')
+        second = create('E2', 'e2@example.com', 'Employee Two', department='Eng')
+        approved = dict(description='x', status='Approved', current_approver_id='FP1',
+                        approved_by_finance=True, approved_by_ceo=True)
+        self.requests = [
+            ('reimbursement', Reimbursement.objects.create(
+                employee=first, amount=Decimal('10.50'), date=date.today(), project_id='P1', **approved)),
+            ('advance', AdvanceRequest.objects.create(
+                employee=first, amount=Decimal('100.00'), request_date=date.today(), project_date=date.today(),
+                project_name='Alpha', **approved)),
+            ('reimbursement', Reimbursement.objects.create(
+                employee=second, amount=Decimal('7.25'), date=date.today(), **approved)),
+        ]
+        self.pending = Reimbursement.objects.create(
+            employee=second, amount=Decimal('1.00'), date=date.today(), description='x',
+            status='Pending', current_approver_id='CEO1',
+        )
+        rollups.rebuild()
+        rollups.rebuild_queue_stats()
+        self.client = APIClient()
+        self.client.force_authenticate(self.fp)
+
+    def _run(self, keys):
+        return self.client.post('/api/finance-payment/payment-runs/', {'requests': [
+            {'request_type': request_type, 'id': request_id} for request_type, request_id in keys
+        ]}, format='json')
+
+    def test_run_and_batch_file(self):
+        keys = [(request_type, obj.id) for request_type, obj in self.requests] + [('reimbursement', self.pending.id)]
+        response = self._run(keys)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['paid']), 3)
+        self.assertEqual(response.data['skipped'][0]['id'], self.pending.id)
+        run = PaymentRun.objects.get()
+        self.assertEqual((run.request_count, run.total_amount, run.created_by_id), (3, Decimal('117.75'), 'FP1'))
+
+        for _, obj in self.requests:
+            obj.refresh_from_db()
+            self.assertEqual((obj.status, obj.current_approver_id, obj.payment_run_id), ('Paid', None, run.id))
+            self.assertEqual(obj.payment_date, run.paid_at)
+        self.assertEqual(ApprovalHistory.objects.filter(action='paid').count(), 3)
+        kept = sorted(ApproverQueueStats.objects.filter(pending_count__gt=0).values_list(
+            'approver_id', 'request_type', 'status', 'pending_count', 'pending_amount'))
+        rollups.rebuild_queue_stats()
+        self.assertEqual(kept, sorted(ApproverQueueStats.objects.filter(pending_count__gt=0).values_list(
+            'approver_id', 'request_type', 'status', 'pending_count', 'pending_amount')))
+
+        download = self.client.get(response.data['run']['batch_file'])
+        self.assertTrue(download.streaming)
+        lines = [line.split(',') for line in b''.join(download.streaming_content).decode().splitlines()]
+        self.assertEqual(lines[0][0], 'Employee ID')
+        self.assertEqual([(line[0], line[4], line[-1]) for line in lines[1:]], [
+            ('E1', 'Reimbursement', '10.50'),
+            ('E1', 'Advance', '100.00'),
+            ('E1', 'Employee Total', '110.50'),
+            ('E2', 'Reimbursement', '7.25'),
+            ('E2', 'Employee Total', '7.25'),
+            ('', '', '117.75'),
+        ])
+
+    def test_paid_requests_are_not_paid_again(self):
+        keys = [(request_type, obj.id) for request_type, obj in self.requests]
+        self.assertEqual(self._run(keys).status_code, 201)
+        response = self._run(keys)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['skipped']), 3)
+        self.assertEqual(PaymentRun.objects.count(), 1)
+
+    def test_finance_payment_only(self):
+        client = APIClient()
+        client.force_authenticate(Employee.objects.get(employee_id='E1'))
+        response = client.post('/api/finance-payment/payment-runs/', {'requests': [
+            {'request_type': 'reimbursement', 'id': self.requests[0][1].id}]}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class ResponseEncodingTests(TestCase):
+    """FastJSONRenderer must render exactly what JSONRenderer does; large responses get compressed"""
+
+    def test_fast_renderer_matches_stock_renderer(self):
+        data = {
+            'amount': Decimal('1234.50'),
+            'created_at': datetime(2025, 1, 2, 3, 4, 5, 123456, tzinfo=dt_timezone.utc),
+            'naive': datetime(2025, 1, 2, 3, 4, 5),
+            'date': date(2025, 1, 2),
+            'label': gettext_lazy('Pending'),
+            'nested': [{'id': 1, 'tags': ('a', 'b')}, None, True, 1.5],
+            'by_id': {1: 'one'},
+            'text': 'line\u2028separator \u00e9',
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+    @override_settings(API_COMPRESSION_MIN_SIZE=1024)
+    def test_large_responses_are_compressed(self):
+        employee = Employee.objects.create_user('E1', 'e1@example.com', 'Employee One')
+        for _ in range(20):
+            Reimbursement.objects.create(
+                employee=employee, amount=Decimal('10.00'), date=date.today(), description='Taxi fare',
+            )
+        client = APIClient()
+        client.force_authenticate(employee)
+
+        plain = client.get('/api/reimbursements/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+
+        gzipped = client.get('/api/reimbursements/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(gzipped.content), plain.content)
+        self.assertIn('Accept-Encoding', gzipped['Vary'])
+
+        if brotli is not None:
+            compressed = client.get('/api/reimbursements/', HTTP_ACCEPT_ENCODING='gzip, br')
+            self.assertEqual(compressed['Content-Encoding'], 'br')
+            self.assertEqual(brotli.decompress(compressed.content), plain.content)
+
+        small = client.get('/api/reimbursements/?fields=id', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertLess(len(small.content), 1024)
+        self.assertFalse(small.has_header('Content-Encoding'))
+
+
+class SpendRollupTests(TestCase):
+    """DailySpendRollup stays equal to a rebuild, and the backfill migration fills it"""
+
+    def setUp(self):
+        cache.clear()
+        create = Employee.objects.create_user
+        self.manager = create('M1', 'm1@example.com', 'Manager')
+        create('FV1', 'fv@example.com', 'Verifier', role='Finance Verification')
+        self.employee = create('E1', 'e1@example.com', 'Employee One', department='Ops', report_to='M1')
+
+    def _rollup(self):
+        return sorted(
+            DailySpendRollup.objects.exclude(count=0, amount=0)
+            .values_list('day', 'request_type', 'status', 'department', 'project_id', 'count', 'amount')
+        )
+
+    def test_department_move_keeps_counts(self):
+        reimbursement = Reimbursement.objects.create(
+            employee=self.employee, amount=Decimal('10.00'), date=date.today(), description='x',
+            status='Pending', current_approver_id='M1',
+        )
+        rollups.record(reimbursement)
+        self.assertEqual(reimbursement.department, 'Ops')
+
+        Employee.objects.filter(pk=self.employee.pk).update(department='Eng')
+        process_approval(Reimbursement.objects.get(pk=reimbursement.pk), self.manager, approved=True)
+
+        kept = self._rollup()
+        self.assertFalse(DailySpendRollup.objects.filter(count__lt=0).exists())
+        rollups.rebuild()
+        self.assertEqual(kept, self._rollup())
+        self.assertEqual([row[2:6] for row in kept], [('Pending', 'Ops', '', 1)])
+        self.assertEqual(department_totals(date.today(), status='Pending'),
+                         [{'department': 'Ops', 'amount': 10.0, 'count': 1}])
+
+    def test_backfill_migration(self):
+        from importlib import import_module
+        from django.apps import apps
+        migration = import_module(f'{__package__}.migrations.0012_request_department')
+
+        Reimbursement.objects.create(employee=self.employee, amount=Decimal('5.00'), date=date.today())
+        Reimbursement.objects.update(department='')
+        self.assertFalse(DailySpendRollup.objects.exists())
+
+        migration.backfill_department(apps, None)
+        migration.rebuild_spend_rollup(apps, None)
+        self.assertEqual(Reimbursement.objects.get().department, 'Ops')
+        self.assertEqual([row[2:6] for row in self._rollup()], [('Pending', 'Ops', '', 1)])
+
+
+class ApproverQueueStatsTests(TestCase):
+    """The backfill migration fills ApproverQueueStats, so transitions on existing requests stay non-negative"""
+
+    def test_backfill_then_transition(self):
+        from importlib import import_module
+        from django.apps import apps
+        migration = import_module(f'{__package__}.migrations.0013_backfill_approver_queue_stats')
+
+        manager = Employee.objects.create_user('M1', 'm1@example.com', 'Manager')
+        Employee.objects.create_user('FV1', 'fv@example.com', 'Verifier', role='Finance Verification')
+        employee = Employee.objects.create_user('E1', 'e1@example.com', 'Employee One', report_to='M1')
+        reimbursement = Reimbursement.objects.create(
+            employee=employee, amount=Decimal('10.00'), date=date.today(), status='Pending', current_approver_id='M1',
+        )
+        self.assertFalse(ApproverQueueStats.objects.exists())
+
+        migration.rebuild_queue_stats(apps, None)
+        self.assertEqual(rollups.queue_stats('M1')['reimbursement'], (1, Decimal('10.00')))
+
+        process_approval(reimbursement, manager, approved=True)
+        self.assertFalse(ApproverQueueStats.objects.filter(pending_count__lt=0).exists())
+        self.assertEqual(rollups.queue_stats('M1')['reimbursement'], (0, Decimal('0.00')))
+        self.assertEqual(rollups.queue_stats('FV1')['reimbursement'], (1, Decimal('10.00')))
+
+    def test_only_pending_items_are_counted(self):
+        ceo = Employee.objects.create_user('CEO1', 'ceo@example.com', 'Chief', role='CEO')
+        payer = Employee.objects.create_user('FP1', 'fp@example.com', 'Payer', role='Finance Payment')
+        employee = Employee.objects.create_user('E1', 'e1@example.com', 'Employee One', report_to='CEO1')
+        reimbursement = Reimbursement.objects.create(
+            employee=employee, amount=Decimal('10.00'), date=date.today(), status='Pending', current_approver_id='CEO1',
+        )
+        rollups.record(reimbursement)
+        self.assertEqual(rollups.queue_stats('CEO1')['reimbursement'], (1, Decimal('10.00')))
+
+        # CEO approval hands it to Finance Payment as Approved - not a queue counter any more
+        process_approval(reimbursement, ceo, approved=True)
+        self.assertEqual((reimbursement.status, reimbursement.current_approver_id), ('Approved', 'FP1'))
+        self.assertFalse(ApproverQueueStats.objects.filter(pending_count__gt=0).exists())
+        rollups.rebuild_queue_stats()
+        self.assertFalse(ApproverQueueStats.objects.exists())
+
+        # Still in the payer's inbox, so paying it tombstones it for their synced clients
+        process_approval(reimbursement, payer, approved=True)
+        removed_for = SyncTombstone.objects.order_by('id').values_list('employee_id', flat=True)
+        self.assertEqual(list(removed_for), ['CEO1', 'FP1'])
+
+
+@override_settings(ALLOWED_HOSTS=['*'])
+class DashboardCacheTests(TestCase):
+    """Cached dashboard payloads embed absolute media URLs, so each host gets its own entry"""
+
+    def test_cache_is_per_host(self):
+        cache.clear()
+        payer = Employee.objects.create_user('FP1', 'fp@example.com', 'Payer', role='Finance Payment')
+        employee = Employee.objects.create_user('E1', 'e1@example.com', 'Employee One', avatar='avatars/a.png')
+        Reimbursement.objects.create(
+            employee=employee, amount=Decimal('10.00'), date=date.today(), status='Approved',
+            current_approver_id='FP1', approved_by_ceo=True,
+        )
+        client = APIClient()
+        client.force_authenticate(payer)
+
+        for host in ('10.0.2.2:8000', '192.168.1.5:8000', '10.0.2.2:8000'):
+            response = client.get('/api/finance-payment/dashboard/', HTTP_HOST=host)
+            self.assertEqual(response.data['ready_for_payment'][0]['employee_avatar'],
+                             f'http://{host}/media/avatars/a.png')
+
+    def test_version_is_shared_between_processes(self):
+        cache.clear()
+        payer = Employee.objects.create_user('FP1', 'fp@example.com', 'Payer', role='Finance Payment')
+        client = APIClient()
+        client.force_authenticate(payer)
+        self.assertEqual(client.get('/api/finance-payment/dashboard/').data['pending_payment_count'], 0)
+
+        # Another worker handles a write: its bump reaches the database, not this process's cache
+        employee = Employee.objects.create_user('E1', 'e1@example.com', 'Employee One')
+        Reimbursement.objects.create(
+            employee=employee, amount=Decimal('10.00'), date=date.today(), status='Approved',
+            current_approver_id='FP1', approved_by_ceo=True,
+        )
+        before = data_version()
+        DataVersion.objects.filter(pk=1).update(value=F('value') + 1)
+        self.assertEqual(data_version(), before + 1)
+        self.assertEqual(client.get('/api/finance-payment/dashboard/').data['pending_payment_count'], 1)
+
+
+class FinancePaymentReadyTests(TestCase):
+    """The FP dashboard and insights count the same requests as ready for payment"""
+
+    def test_insights_match_dashboard(self):
+        cache.clear()
+        payer = Employee.objects.create_user('FP1', 'fp1@example.com', 'Payer', role='Finance Payment')
+        Employee.objects.create_user('FP2', 'fp2@example.com', 'Other Payer', role='Finance Payment')
+        employee = Employee.objects.create_user('E1', 'e1@example.com', 'Employee One')
+        for approver, amount in (('FP1', '10.00'), ('FP2', '20.00')):
+            Reimbursement.objects.create(
+                employee=employee, amount=Decimal(amount), date=date.today(), status='Approved',
+                current_approver_id=approver, approved_by_ceo=True,
+            )
+        AdvanceRequest.objects.create(
+            employee=employee, amount=Decimal('5.00'), request_date=date.today(), project_date=date.today(), status='Paid',
+            current_approver_id='FP1', approved_by_ceo=True,
+        )
+        client = APIClient()
+        client.force_authenticate(payer)
+
+        dashboard = client.get('/api/finance-payment/dashboard/').data
+        insights = client.get('/api/finance-payment/insights/').data
+        self.assertEqual(dashboard['pending_payment_count'], 2)
+        self.assertEqual(insights['total_ready'], dashboard['pending_payment_count'])
+        self.assertEqual(insights['ready_amount'], 30.0)
+
+
+class ApprovalLatencyTests(TestCase):
+    """GET /api/analytics/approval-latency/ - percentiles per stage from consecutive history rows"""
+
+    url = '/api/analytics/approval-latency/'
+
+    def setUp(self):
+        cache.clear()
+        create = Employee.objects.create_user
+        self.ceo = create('CEO1', 'ceo@example.com', 'Chief', role='CEO')
+        create('M1', 'm1@example.com', 'Manager')
+        employee = create('E1', 'e1@example.com', 'Employee One', report_to='M1')
+        submitted = timezone.now() - timedelta(days=2)
+        # The manager decided after 1, 2, 3 and 4 hours
+        for hours in (1, 2, 3, 4):
+            reimbursement = Reimbursement.objects.create(employee=employee, amount=Decimal('1.00'), date=date.today())
+            for approver_id, action, at in (('E1', 'submitted', submitted),
+                                            ('M1', 'approved', submitted + timedelta(hours=hours))):
+                entry = ApprovalHistory.objects.create(
+                    request_type='reimbursement', request_id=reimbursement.id, approver_id=approver_id,
+                    approver_name=approver_id, action=action,
+                )
+                ApprovalHistory.objects.filter(pk=entry.pk).update(timestamp=at)
+        self.client = APIClient()
+        self.client.force_authenticate(self.ceo)
+
+    def test_stage_percentiles(self):
+        response = self.client.get(self.url, {'days': 30})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['request_type'], 'all')
+        self.assertEqual(response.data['stages'], [{
+            'stage': 'Manager', 'count': 4, 'avg_hours': 2.5, 'p50_hours': 2.5, 'p90_hours': 3.7, 'p99_hours': 3.97,
+        }])
+        self.assertEqual([row['approver_id'] for row in response.data['approvers']], ['M1'])
+
+        advances = self.client.get(self.url, {'days': 30, 'request_type': 'advance'})
+        self.assertEqual((advances.data['request_type'], advances.data['stages']), ('advance', []))
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'request_type': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'days': 0}).status_code, 400)
+
+
+class SpendTimeSeriesTests(TestCase):
+    """GET /api/analytics/spend-series/ - one gap-filled point per day/week/month bucket"""
+
+    url = '/api/analytics/spend-series/'
+
+    def setUp(self):
+        cache.clear()
+        ceo = Employee.objects.create_user('CEO1', 'ceo@example.com', 'Chief', role='CEO')
+        employee = Employee.objects.create_user('E1', 'e1@example.com', 'Employee One', department='Ops')
+        Reimbursement.objects.create(employee=employee, amount=Decimal('10.00'), date=date(2026, 1, 5))
+        AdvanceRequest.objects.create(employee=employee, amount=Decimal('5.50'), request_date=date(2026, 1, 14),
+                                      project_date=date(2026, 1, 14))
+        Reimbursement.objects.create(employee=employee, amount=Decimal('20.00'), date=date(2026, 3, 2))
+        rollups.rebuild()
+        self.client = APIClient()
+        self.client.force_authenticate(ceo)
+
+    def _series(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_month_buckets_are_gap_filled(self):
+        data = self._series(bucket='month', start='2026-01-01', end='2026-03-31')
+
+        self.assertEqual([(point['period'], point['count'], point['amount']) for point in data['series']], [
+            ('2026-01-01', 2, 15.5), ('2026-02-01', 0, 0.0), ('2026-03-01', 1, 20.0),
+        ])
+        self.assertEqual((data['series'][0]['reimbursement_count'], data['series'][0]['advance_amount']), (1, 5.5))
+        self.assertEqual((data['total_count'], data['total_amount']), (3, 35.5))
+
+    def test_week_and_day_buckets(self):
+        # ISO weeks start on Monday; only requests dated inside start..end count
+        weeks = self._series(bucket='week', start='2026-01-07', end='2026-01-20')
+        self.assertEqual([(point['period'], point['count']) for point in weeks['series']], [
+            ('2026-01-05', 0), ('2026-01-12', 1), ('2026-01-19', 0),
+        ])
+
+        days = self._series(bucket='day', start='2026-01-04', end='2026-01-06', request_type='reimbursement')
+        self.assertEqual([point['count'] for point in days['series']], [0, 1, 0])
+
+    def test_invalid_parameters(self):
+        for params in ({'bucket': 'year'}, {'start': 'nope'}, {'start': '2026-02-01', 'end': '2026-01-01'},
+                       {'bucket': 'day', 'start': '2025-01-01', 'end': '2026-02-05'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+        # 400 daily buckets is still allowed
+        self.assertEqual(len(self._series(bucket='day', start='2025-01-01', end='2026-02-04')['series']), 400)
+
+
+class PendingApprovalsPaginationTests(TestCase):
+    """GET /api/approvals/pending/?limit=&cursor= walks every list once, in order"""
+
+    url = '/api/approvals/pending/'
+
+    def setUp(self):
+        cache.clear()
+        self.manager = Employee.objects.create_user('M1', 'm1@example.com', 'Manager')
+        employee = Employee.objects.create_user('E1', 'e1@example.com', 'Employee One', report_to='M1')
+        self.waiting = [
+            Reimbursement.objects.create(employee=employee, amount=Decimal(n), date=date.today(),
+                                         status='Pending', current_approver_id='M1').id
+            for n in range(1, 8)
+        ]
+        self.own = [
+            AdvanceRequest.objects.create(employee=self.manager, amount=Decimal(n), request_date=date.today(),
+                                          project_date=date.today()).id
+            for n in range(1, 3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def test_cursor_walk(self):
+        lists = ('reimbursements_to_approve', 'advances_to_approve', 'my_reimbursements', 'my_advances')
+        seen = {key: [] for key in lists}
+        params = {'limit': 3}
+        pages = 0
+        while True:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 200)
+            pages += 1
+            for key in seen:
+                self.assertLessEqual(len(response.data[key]), 3)
+                seen[key] += [row['id'] for row in response.data[key]]
+            if response.data['next_cursor'] is None:
+                break
+            params = {'limit': 3, 'cursor': response.data['next_cursor']}
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen['reimbursements_to_approve'], self.waiting)  # oldest first
+        self.assertEqual(seen['my_advances'], self.own[::-1])  # newest first
+        self.assertEqual((seen['advances_to_approve'], seen['my_reimbursements']), ([], []))
+
+    def test_invalid_cursor_and_limit(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'not-a-cursor'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'limit': 'ten'}).status_code, 400)
+
+
+class RequestSyncTests(TestCase):
+    """GET /api/sync/?since=<token> returns upserts and tombstones since the last call"""
+
+    url = '/api/sync/'
+
+    def setUp(self):
+        cache.clear()
+        create = Employee.objects.create_user
+        self.manager = create('M1', 'm1@example.com', 'Manager')
+        create('FV1', 'fv@example.com', 'Verifier', role='Finance Verification')
+        employee = create('E1', 'e1@example.com', 'Employee One', report_to='M1')
+        self.waiting = Reimbursement.objects.create(
+            employee=employee, amount=Decimal('10.00'), date=date.today(), status='Pending', current_approver_id='M1',
+        )
+        self.own = AdvanceRequest.objects.create(
+            employee=self.manager, amount=Decimal('5.00'), request_date=date.today(), project_date=date.today(),
+        )
+        rollups.rebuild_queue_stats()
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def _sync(self, token=None):
+        response = self.client.get(self.url, {'since': token} if token else {})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_token_round_trip(self):
+        moment = timezone.now()
+        self.assertEqual(decode_token(encode_token(moment)), moment)
+        with self.assertRaises(ValueError):
+            decode_token(encode_token(datetime(2026, 1, 1)))  # naive
+        self.assertEqual(self.client.get(self.url, {'since': 'garbage'}).status_code, 400)
+
+    def test_full_then_delta_with_tombstone(self):
+        first = self._sync()
+        self.assertTrue(first['full'])
+        self.assertEqual(([row['id'] for row in first['reimbursements']], [row['id'] for row in first['advances']]),
+                         ([self.waiting.id], [self.own.id]))
+        self.assertTrue(first['reimbursements'][0]['in_my_queue'])
+
+        # The manager approves: the request moves on to FV1 and leaves the manager's view
+        moment = timezone.now() - timedelta(minutes=1)
+        Reimbursement.objects.update(updated_at=moment)
+        AdvanceRequest.objects.update(updated_at=moment)
+        token = encode_token(moment + timedelta(seconds=1))
+        process_approval(Reimbursement.objects.get(pk=self.waiting.pk), self.manager, approved=True)
+
+        delta = self._sync(token)
+        self.assertFalse(delta['full'])
+        self.assertEqual((delta['reimbursements'], delta['advances']), ([], []))
+        self.assertEqual([(row['request_type'], row['id']) for row in delta['tombstones']],
+                         [('reimbursement', self.waiting.id)])
+
+    def test_token_overlaps_the_read(self):
+        data = self._sync()
+        issued = decode_token(data['token'])
+        self.assertLessEqual(issued, timezone.now() - timedelta(seconds=5))
+
+        # A write that committed just before the previous read is sent again, not lost
+        AdvanceRequest.objects.filter(pk=self.own.pk).update(updated_at=issued + timedelta(seconds=2))
+        self.assertEqual([row['id'] for row in self._sync(data['token'])['advances']], [self.own.id])
+
+    def test_expired_token_gets_full_snapshot(self):
+        self.assertTrue(self._sync(encode_token(timezone.now() - timedelta(days=31)))['full'])
+
+    def test_prune_command(self):
+        from django.core.management import call_command
+        old = SyncTombstone.objects.create(employee_id='M1', request_type='advance', request_id=1)
+        SyncTombstone.objects.filter(pk=old.pk).update(removed_at=timezone.now() - timedelta(days=31))
+        recent = SyncTombstone.objects.create(employee_id='M1', request_type='advance', request_id=2)
+
+        call_command('prune_sync_tombstones', stdout=StringIO())
+        self.assertEqual(list(SyncTombstone.objects.values_list('id', flat=True)), [recent.id])
+
+
+class ConditionalGetTests(TestCase):
+    """Polled views answer If-None-Match with 304 until their data changes"""
+
+    def test_not_modified_until_data_changes(self):
+        cache.clear()
+        manager = Employee.objects.create_user('M1', 'm1@example.com', 'Manager')
+        employee = Employee.objects.create_user('E1', 'e1@example.com', 'Employee One', report_to='M1')
+        Reimbursement.objects.create(employee=employee, amount=Decimal('10.00'), date=date.today(),
+                                     status='Pending', current_approver_id='M1')
+        client = APIClient()
+        client.force_authenticate(manager)
+
+        first = client.get('/api/approvals/pending/')
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+
+        repeat = client.get('/api/approvals/pending/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat.content, b'')
+
+        Reimbursement.objects.create(employee=employee, amount=Decimal('20.00'), date=date.today(),
+                                     status='Pending', current_approver_id='M1')
+        changed = client.get('/api/approvals/pending/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertEqual(len(changed.data['reimbursements_to_approve']), 2)
+
+
+class CEOAnalyticsTotalsTests(TestCase):
+    """CEO analytics counters equal the per-queryset Python sums the conditional aggregates replaced"""
+
+    def setUp(self):
+        cache.clear()
+        create = Employee.objects.create_user
+        self.ceo = create('CEO1', 'ceo@example.com', 'Chief', role='CEO', department='Exec')
+        employee = create('E1', 'e1@example.com', 'Employee One', department='Ops', report_to='CEO1')
+
+        today = timezone.now().date()
+        month_start = today.replace(day=1)
+        days = [
+            today, month_start, today - timedelta(days=today.weekday()), today + timedelta(days=3),
+            (month_start - timedelta(days=1)).replace(day=10), today - timedelta(days=75),
+        ]
+        for i, day in enumerate(days):
+            for j, request_status in enumerate(['Pending', 'Approved', 'Rejected', 'Paid']):
+                fields = dict(
+                    employee=employee, amount=Decimal(f'{10 + 7 * i + j}.25'), description='x', status=request_status,
+                    current_approver_id='CEO1' if (i + j) % 3 == 0 else 'M1',
+                )
+                if (i + j) % 2:
+                    obj = AdvanceRequest.objects.create(request_date=day, project_date=day, **fields)
+                else:
+                    obj = Reimbursement.objects.create(date=day, **fields)
+                if i % 2:
+                    type(obj).objects.filter(pk=obj.pk).update(created_at=timezone.now() - timedelta(days=2))
+        rollups.rebuild()
+
+    def _legacy(self):
+        """What the per-queryset loops of the original view returned, over plain model instances"""
+        today = timezone.now().date()
+        month_start = today.replace(day=1)
+        last_month_start = (month_start - timedelta(days=1)).replace(day=1)
+        week_start = today - timedelta(days=today.weekday())
+
+        rows = [(r.date, r) for r in Reimbursement.objects.all()]
+        rows += [(a.request_date, a) for a in AdvanceRequest.objects.all()]
+        month = [obj for day, obj in rows if day >= month_start]
+        approved = [obj for obj in month if obj.status == 'Approved']
+        last_month = sum(1 for day, obj in rows if last_month_start <= day < month_start and obj.status == 'Approved')
+        total = len(month)
+        return {
+            'monthly_approved_count': len(approved),
+            'monthly_spending': float(sum(obj.amount for obj in approved)),
+            'approval_rate': float(len(approved) / total * 100),
+            'average_request_amount': float(sum(obj.amount for obj in month) / total),
+            'total_requests_this_month': total,
+            'monthly_growth': float((len(approved) - last_month) / last_month * 100),
+            'pending_ceo_actions': sum(
+                1 for _, obj in rows if obj.current_approver_id == 'CEO1' and obj.status == 'Pending'),
+            'weekly_approved': sum(1 for day, obj in rows if day >= week_start and obj.status == 'Approved'),
+            'todays_requests': sum(1 for _, obj in rows if obj.created_at.date() == today),
+            'reimbursement_count': sum(1 for obj in month if isinstance(obj, Reimbursement)),
+            'advance_count': sum(1 for obj in month if isinstance(obj, AdvanceRequest)),
+            'approved_count': len(approved),
+            'rejected_count': sum(1 for obj in month if obj.status == 'Rejected'),
+            'pending_count': sum(1 for obj in month if obj.status == 'Pending'),
+        }
+
+    def test_counters_match_python_sums(self):
+        client = APIClient()
+        client.force_authenticate(self.ceo)
+        data = client.get('/api/ceo/analytics/').data
+
+        expected = self._legacy()
+        self.assertGreater(expected['todays_requests'], 0)
+        self.assertGreater(expected['pending_ceo_actions'], 0)
+        for key, value in expected.items():
+            with self.subTest(key=key):
+                self.assertEqual(data[key], value)
+
+
+class ProcessingTimeTests(TestCase):
+    """Submission -> approval averages computed in SQL equal the old per-row .get() loop"""
+
+    def setUp(self):
+        cache.clear()
+        create = Employee.objects.create_user
+        self.ceo = create('CEO1', 'ceo@example.com', 'Chief', role='CEO')
+        self.fv = create('FV1', 'fv@example.com', 'Verifier', role='Finance Verification')
+        employee = create('E1', 'e1@example.com', 'Employee One')
+        now = timezone.now()
+
+        def request(model, hours_ago, **fields):
+            obj = model.objects.create(employee=employee, amount=Decimal('10.00'), description='x', **fields)
+            model.objects.filter(pk=obj.pk).update(created_at=now - timedelta(hours=hours_ago))
+            return obj
+
+        def approve(obj, approver_id, action='approved', at=now):
+            entry = ApprovalHistory.objects.create(
+                request_type='reimbursement' if isinstance(obj, Reimbursement) else 'advance',
+                request_id=obj.id, approver_id=approver_id, action=action,
+            )
+            ApprovalHistory.objects.filter(pk=entry.pk).update(timestamp=at)
+
+        # Reimbursement and advance ids overlap, so the join must use the request type too
+        reimbursements = [request(Reimbursement, hours, date=date.today()) for hours in (5, 30, 70)]
+        advances = [
+            request(AdvanceRequest, hours, request_date=date.today(), project_date=date.today())
+            for hours in (3, 200)
+        ]
+        for obj in reimbursements + advances:
+            approve(obj, 'FV1', at=now - timedelta(hours=1))
+        approve(reimbursements[0], 'FV1', action='rejected')
+        approve(reimbursements[1], 'CEO1')
+        approve(advances[1], 'CEO1')
+        approve(reimbursements[2], 'CEO1', at=timezone.make_aware(
+            datetime.combine(date.today().replace(day=1), datetime.min.time())) - timedelta(hours=1))
+        gone = request(Reimbursement, 10, date=date.today())
+        approve(gone, 'FV1')
+        approve(gone, 'CEO1')
+        gone.delete()
+
+    def _legacy_hours(self, history):
+        total_hours, count = 0, 0
+        for approval in history:
+            model = Reimbursement if approval.request_type == 'reimbursement' else AdvanceRequest
+            try:
+                created_time = model.objects.get(id=approval.request_id).created_at
+            except model.DoesNotExist:
+                continue
+            total_hours += (approval.timestamp - created_time).total_seconds() / 3600
+            count += 1
+        return total_hours / count if count > 0 else 0.0
+
+    def test_averages_match_per_row_loop(self):
+        fv_history = ApprovalHistory.objects.filter(approver_id='FV1', action='approved')
+        month_start = timezone.make_aware(datetime.combine(date.today().replace(day=1), datetime.min.time()))
+        ceo_history = ApprovalHistory.objects.filter(approver_id='CEO1', action='approved', timestamp__gte=month_start)
+
+        self.assertAlmostEqual(average_processing_hours(fv_history), self._legacy_hours(fv_history), places=6)
+        self.assertAlmostEqual(average_processing_hours(ceo_history), self._legacy_hours(ceo_history), places=6)
+
+        client = APIClient()
+        client.force_authenticate(self.fv)
+        self.assertEqual(client.get('/api/finance-verification/insights/').data['avg_processing_time'],
+                         round(self._legacy_hours(fv_history), 1))
+        client.force_authenticate(self.ceo)
+        self.assertEqual(client.get('/api/ceo/analytics/').data['avg_processing_time'],
+                         round(self._legacy_hours(ceo_history), 1))
+
+
+class DepartmentStatsTests(TestCase):
+    """CEO department_stats equal the old loop over distinct departments"""
+
+    def setUp(self):
+        cache.clear()
+        create = Employee.objects.create_user
+        self.ceo = create('CEO1', 'ceo@example.com', 'Chief', role='CEO', department='Exec')
+        today = timezone.now().date()
+        last_month = (today.replace(day=1) - timedelta(days=1)).replace(day=10)
+        for i, department in enumerate(['Ops', 'Eng', 'Sales', 'Ops', '', None]):
+            employee = create(f'E{i}', f'e{i}@example.com', f'Employee {i}', department=department)
+            for j, (day, request_status) in enumerate([
+                (today, 'Approved'), (today, 'Approved'), (today, 'Rejected'), (last_month, 'Approved'),
+            ]):
+                fields = dict(
+                    employee=employee, amount=Decimal(f'{i + 1}{j}.25'), description='x', status=request_status,
+                )
+                if j % 2:
+                    AdvanceRequest.objects.create(request_date=day, project_date=day, **fields)
+                else:
+                    Reimbursement.objects.create(date=day, **fields)
+        rollups.rebuild()
+
+    def _legacy(self):
+        month_start = timezone.now().date().replace(day=1)
+        stats = []
+        for department in Employee.objects.values_list('department', flat=True).distinct():
+            if not department:
+                continue
+            reimbursements = Reimbursement.objects.filter(
+                employee__department=department, date__gte=month_start, status='Approved')
+            advances = AdvanceRequest.objects.filter(
+                employee__department=department, request_date__gte=month_start, status='Approved')
+            count = reimbursements.count() + advances.count()
+            if count > 0:
+                amount = sum(r.amount for r in reimbursements) + sum(a.amount for a in advances)
+                stats.append({'department': department, 'amount': float(amount), 'count': count})
+        return sorted(stats, key=lambda row: row['department'])
+
+    def test_grouping_matches_per_department_loop(self):
+        client = APIClient()
+        client.force_authenticate(self.ceo)
+        stats = client.get('/api/ceo/analytics/').data['department_stats']
+
+        self.assertEqual([row['department'] for row in stats], ['Eng', 'Ops', 'Sales'])
+        self.assertEqual(stats, self._legacy())
+
+
+class ExpenseRequestsUnionTests(TestCase):
+    """The UNION ALL read layer returns the same rows, order and types as merging the two tables in Python"""
+
+    def setUp(self):
+        employee = Employee.objects.create_user('E1', 'e1@example.com', 'Employee One', department='Ops')
+        now = timezone.now()
+        for i in range(6):
+            fields = dict(employee=employee, amount=Decimal(f'{i + 1}0.50'), description=f'item {i}', status='Pending')
+            if i % 2:
+                obj = AdvanceRequest.objects.create(
+                    request_date=date(2026, 1, i + 1), project_date=date(2026, 2, i + 1), project_name=f'Project {i}',
+                    approved_by_hr=i == 3, **fields,
+                )
+            else:
+                obj = Reimbursement.objects.create(date=date(2026, 1, i + 1), **fields)
+            # Interleave the two tables in time
+            type(obj).objects.filter(pk=obj.pk).update(created_at=now - timedelta(hours=[4, 1, 6, 2, 3, 5][i]))
+
+    def test_rows_order_and_types(self):
+        rows = list(expense_requests(Reimbursement.objects.all(), AdvanceRequest.objects.all()).order_by('-created_at'))
+        merged = sorted(
+            chain(Reimbursement.objects.all(), AdvanceRequest.objects.all()),
+            key=lambda obj: obj.created_at, reverse=True,
+        )
+
+        self.assertEqual(
+            [(row['request_type'], row['id']) for row in rows],
+            [('reimbursement' if isinstance(obj, Reimbursement) else 'advance', obj.id) for obj in merged],
+        )
+        for row, obj in zip(rows, merged):
+            with self.subTest(request_type=row['request_type'], id=row['id']):
+                is_advance = isinstance(obj, AdvanceRequest)
+                self.assertEqual(row['amount'], obj.amount)
+                self.assertIsInstance(row['amount'], Decimal)
+                self.assertEqual(row['created_at'], obj.created_at)
+                self.assertIsInstance(row['expense_date'], date)
+                self.assertEqual(row['expense_date'], obj.request_date if is_advance else obj.date)
+                self.assertEqual(row['advance_project_date'], obj.project_date if is_advance else None)
+                self.assertEqual(row['project_title'], obj.project_name if is_advance else None)
+                self.assertIs(row['hr_approved'], obj.approved_by_hr if is_advance else False)
+                self.assertEqual((row['employee_name'], row['employee_department']), ('Employee One', 'Ops'))
+
+        page = expense_requests(Reimbursement.objects.all(), AdvanceRequest.objects.all()).order_by('-created_at')[2:4]
+        self.assertEqual([row['id'] for row in page], [obj.id for obj in merged[2:4]])
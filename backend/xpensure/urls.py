@@ -15,10 +15,14 @@ from .views import (
     EmployeeDeleteView,
     ApproveRequestAPIView,
     RejectRequestAPIView,
+    BulkApprovalView,
     PendingApprovalsView,
+    RequestSyncView,
     FinanceVerificationInsightsView,
     CEODashboardView,
     CEOAnalyticsView,
+    SpendTimeSeriesView,
+    ApprovalLatencyView,
     CEOHistoryView,
     CEOApproveRequestView,
     CEORejectRequestView,
@@ -26,11 +30,14 @@ from .views import (
     CEOGenerateReportView,
     EmployeeCSVDownloadView,
     ApprovalTimelineView,
+    RequestBatchDetailsView,
     FinanceVerificationDashboardView,
     FinanceVerificationApproveView,
     FinanceVerificationRejectView,
     FinancePaymentDashboardView,
     FinanceMarkAsPaidView,
+    PaymentRunView,
+    PaymentRunCSVView,
     FinancePaymentInsightsView,
     EmployeeProjectSpendingView,
     FinanceVerificationHistoryView,
@@ -79,14 +86,18 @@ api_patterns = [
 
     # Multi-level Request Approval Workflow
     path('approvals/pending/', PendingApprovalsView.as_view(), name='pending-approvals'),
+    path('sync/', RequestSyncView.as_view(), name='request-sync'),
     path('approvals/<int:request_id>/approve/', ApproveRequestAPIView.as_view(), name='approve-request'),
     path('approvals/<int:request_id>/reject/', RejectRequestAPIView.as_view(), name='reject-request'),
+    path('approvals/bulk/', BulkApprovalView.as_view(), name='bulk-approval'),
     #Add this to your urlpatterns
     path('approver/csv-download/', ApproverCSVDownloadView.as_view(), name='approver-csv-download'),
     
     
     path('ceo/dashboard/', CEODashboardView.as_view(), name='ceo-dashboard'),
     path('ceo/analytics/', CEOAnalyticsView.as_view(), name='ceo-analytics'),
+    path('analytics/spend-series/', SpendTimeSeriesView.as_view(), name='spend-time-series'),
+    path('analytics/approval-latency/', ApprovalLatencyView.as_view(), name='approval-latency'),
     path('ceo/history/', CEOHistoryView.as_view(), name='ceo-history'),
     path('ceo/approve-request/', CEOApproveRequestView.as_view(), name='ceo-approve-request'),
     path('ceo/reject-request/', CEORejectRequestView.as_view(), name='ceo-reject-request'),
@@ -94,6 +105,7 @@ api_patterns = [
     path('ceo/generate-report/', CEOGenerateReportView.as_view(), name='ceo-generate-report'),
 
     path('approval-timeline/<int:request_id>/', ApprovalTimelineView.as_view(), name='approval-timeline'),
+    path('requests/batch-details/', RequestBatchDetailsView.as_view(), name='request-batch-details'),
 
     # Finance Verification URLs
     path('finance-verification/dashboard/', FinanceVerificationDashboardView.as_view(), name='finance-verification-dashboard'),
@@ -103,6 +115,8 @@ api_patterns = [
     # Finance Payment URLs  
     path('finance-payment/dashboard/', FinancePaymentDashboardView.as_view(), name='finance-payment-dashboard'),
     path('finance-payment/mark-paid/', FinanceMarkAsPaidView.as_view(), name='finance-payment-mark-paid'),
+    path('finance-payment/payment-runs/', PaymentRunView.as_view(), name='payment-run'),
+    path('finance-payment/payment-runs/<int:run_id>/csv/', PaymentRunCSVView.as_view(), name='payment-run-csv'),
     path('finance-payment/insights/',FinancePaymentInsightsView.as_view(), name='finance-payment-insights'),
   
     path('employee-project-spending/', EmployeeProjectSpendingView.as_view(), name='employee-project-spending'),